@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""
+Measure the client-side overhead of Document.find(), from translating the
+query to constructing the cursor, and of resolving a class's collection.
+Needs no database: the client is created without connecting, and no cursor is
+iterated.
+
+    python benchmarks/bench_find.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pymongo
+import mongotron
+
+
+class User(mongotron.Document):
+    __db__ = 'bench'
+    structure = {
+        'name': unicode,
+        'age': int,
+        'tags': [unicode],
+    }
+    field_map = {'name': 'n', 'age': 'a', 'tags': 't'}
+
+
+def main():
+    client = pymongo.MongoClient('localhost', 27017, _connect=False)
+    mongotron.GetConnectionManager().add_connection(client)
+
+    number = 20000
+    spec = {'name': u'bob', 'age': {'$gt': 18}}
+    secs = min(timeit.repeat(lambda: User.find(spec), number=number, repeat=5))
+    print 'find: %.2f usec/call' % (secs / number * 1e6)
+    secs = min(timeit.repeat(lambda: User._dbcollection, number=number,
+                             repeat=5))
+    print '_dbcollection: %.2f usec/access' % (secs / number * 1e6)
+
+
+if __name__ == '__main__':
+    main()
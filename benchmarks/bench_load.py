@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+Measure the per-document cost of loading a dict into a Document, as done for
+every result of a cursor. Needs no database connection.
+
+    python benchmarks/bench_load.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import bson
+import mongotron
+
+
+class Wide(mongotron.Document):
+    __db__ = 'bench'
+    structure = dict(('field%d' % i, int) for i in xrange(20))
+    structure.update({
+        'name': unicode,
+        'tags': [unicode],
+        'score': float,
+        'flag': bool,
+    })
+    field_map = dict(('field%d' % i, 'f%d' % i) for i in xrange(20))
+    field_map.update({'name': 'n', 'tags': 't', 'score': 's', 'flag': 'b'})
+    default_values = {'score': 1.0, 'flag': True, 'tags': []}
+
+
+RAW = dict(('f%d' % i, i) for i in xrange(20))
+RAW.update({'_id': bson.ObjectId(), 'n': u'bench'})
+
+
+def main():
+    number = 20000
+    secs = min(timeit.repeat(lambda: Wide(RAW), number=number, repeat=5))
+    print 'load: %.2f usec/document' % (secs / number * 1e6)
+
+    for lazy in (False, True):
+        def load_and_read():
+            doc = Wide(RAW, lazy=lazy)
+            doc.name
+            doc.field3
+        secs = min(timeit.repeat(load_and_read, number=number, repeat=5))
+        print 'load%s, read 2 fields: %.2f usec/document' %\
+            (' lazily' if lazy else '', secs / number * 1e6)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Cache.py
+
+Read-through caches for documents looked up by _id.
+"""
+
+from __future__ import absolute_import
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class Cache(object):
+    """Interface implemented by cache backends assigned to
+    :py:attr:`Document.__cache__`. Keys are hashable tuples identifying a
+    stored document, and values are the document's dict as returned by
+    MongoDB. Implement this to store documents somewhere other than in
+    process memory.
+    """
+    def get(self, key):
+        """Return the value stored for `key`, or ``None``."""
+        raise NotImplementedError
+
+    def set(self, key, value):
+        """Store `value` for `key`."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Forget `key` if it is stored."""
+        raise NotImplementedError
+
+    def clear(self):
+        """Forget all keys."""
+        raise NotImplementedError
+
+    def stats(self):
+        """Return a dict of counters describing cache effectiveness."""
+        return {}
+
+
+class LRUCache(Cache):
+    """An in-process, thread-safe cache holding up to `max_size` entries,
+    each of which expires `ttl` seconds after being stored. The least recently
+    used entry is evicted when the cache is full.
+
+    ::
+
+        class User(Document):
+            __cache__ = LRUCache(max_size=10000, ttl=60)
+
+    :py:meth:`stats` reports ``hits``, ``misses`` (including expired
+    entries), ``evictions`` and the current ``size``.
+
+        `max_size`:
+            Maximum number of entries held.
+
+        `ttl`:
+            Seconds after which an entry expires, or ``None`` to hold entries
+            until evicted or invalidated.
+    """
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.pop(key, None)
+            if item is None or (item[0] is not None and item[0] < time.time()):
+                self.misses += 1
+                return None
+            self._items[key] = item
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        expires = None
+        if self.ttl is not None:
+            expires = time.time() + self.ttl
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = (expires, value)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._items)
+        }
@@ -7,27 +7,170 @@ Created by Tony Million on 2013-01-27.
 Copyright (c) 2013 Narrato. All rights reserved.
 """
 
+import os
+import threading
+
 #very simple class that "manages" the connections in use on this system
 # its up to you as the user to add the connections - at the most basic you call
 #  manager.add_connection(yourMongoClient)  which will register a default client
+#
+# Alternatively register a factory, and the client is created on first use in
+# each process:
+#  manager.add_connection(name='reports', factory=MongoClient,
+#                         host='reports.local', max_pool_size=20)
 
 _conn_pool = {}
 
+#: Types of operation that may be routed by ConnectionManager.add_route().
+OPERATIONS = ('read', 'write', 'scan')
+
+# Map of (Document class or None, operation) to (connection name, options).
+_routes = {}
+
+# Incremented whenever a connection or route changes, so cached collections
+# resolved under an earlier configuration are discarded.
+_generation = 0
+
+# Guards creation of clients from factories; replaced after fork since it may
+# have been held by another thread at the time.
+_lock = threading.Lock()
+_lock_pid = os.getpid()
+
+
+def _get_lock():
+    global _lock, _lock_pid
+    if _lock_pid != os.getpid():
+        _lock = threading.Lock()
+        _lock_pid = os.getpid()
+    return _lock
+
+
+class _Connection(object):
+    """A registered connection: either a ready-made client, or a factory and
+    the keyword arguments to call it with, plus the client it created and the
+    process it was created in."""
+    def __init__(self, client=None, factory=None, kwargs=None):
+        self.client = client
+        self.factory = factory
+        self.kwargs = kwargs or {}
+        self.pid = os.getpid() if client is not None else None
+
+    def get(self):
+        if self.factory is None or self.pid == os.getpid():
+            return self.client
+        with _get_lock():
+            if self.pid != os.getpid():
+                # Never reuse sockets inherited from the parent process.
+                self.client = self.factory(**self.kwargs)
+                self.pid = os.getpid()
+        return self.client
+
+
 class ConnectionManager(object):
 
-    def add_connection(self, connection, name='default'):
-        _conn_pool[name] = connection
-        pass
+    def add_connection(self, connection=None, name='default', factory=None,
+                       **client_kwargs):
+        """Register a client under `name`.
+
+            `connection`:
+                Ready-made client, used as is in every process.
+
+            `factory`:
+                Instead of `connection`, a function called with
+                `client_kwargs` to create the client when it is first used by
+                a process, and again in any child process that uses it after
+                a fork. Defaults to :py:class:`pymongo.MongoClient` if neither
+                is given.
+
+            `client_kwargs`:
+                Keyword arguments for `factory`, such as ``host``,
+                ``max_pool_size`` or ``socketTimeoutMS``, so each named
+                connection may be configured separately.
+
+        For convenience the name may be passed first when registering a
+        factory: ``add_connection('reports', factory=MongoClient)``.
+        """
+        global _generation
+        if isinstance(connection, basestring):
+            name, connection = connection, None
+        _generation += 1
+        if connection is not None:
+            if factory is not None or client_kwargs:
+                raise TypeError('pass either a connection or a factory')
+            _conn_pool[name] = _Connection(client=connection)
+            return
+        if factory is None:
+            import pymongo
+            factory = pymongo.MongoClient
+        _conn_pool[name] = _Connection(factory=factory, kwargs=client_kwargs)
 
     def get_connection(self, name='default', default_if_none=False):
         if name in _conn_pool:
-            return _conn_pool[name]
+            return _conn_pool[name].get()
 
         if default_if_none:
-            return _conn_pool['default']
+            return _conn_pool['default'].get()
 
         return None;
-        
+
+    def add_route(self, op, connection=None, doc_class=None, **options):
+        """Send operations of type `op` for `doc_class` and its subclasses, or
+        for every class if `doc_class` is ``None``, to the connection
+        registered as `connection`. Routes for a class take precedence over
+        routes for its bases, which take precedence over routes for every
+        class.
+
+            `op`:
+                ``'read'`` for queries (:py:meth:`Document.find` and
+                friends), ``'write'`` for saves, updates and deletes, or
+                ``'scan'`` for bulk reads (:py:meth:`Document.parallel_scan`,
+                :py:mod:`mongotron.export`). Scans follow the read route
+                unless given their own.
+
+            `connection`:
+                Name of the connection to use, or ``None`` to keep using the
+                class's :py:attr:`__connection__`.
+
+            `options`:
+                Attributes to set on the collection, such as
+                ``read_preference``, ``tag_sets`` or
+                ``secondary_acceptable_latency_ms``.
+
+        ::
+
+            mgr.add_route('read', read_preference=ReadPreference.SECONDARY)
+            mgr.add_route('scan', 'analytics', doc_class=Event)
+        """
+        if op not in OPERATIONS:
+            raise ValueError('op must be one of %s, got %r' %\
+                             (', '.join(OPERATIONS), op))
+        global _generation
+        _routes[doc_class, op] = (connection, options)
+        _generation += 1
+
+    def get_route(self, doc_class, op):
+        """Return a tuple of ``(connection name, options)`` describing where
+        to send operations of type `op` for `doc_class`, or ``None`` if they
+        are not routed."""
+        for klass in doc_class.__mro__ + (None,):
+            route = _routes.get((klass, op))
+            if route is not None:
+                return route
+        if op == 'scan':
+            return self.get_route(doc_class, 'read')
+
+    def clear_routes(self):
+        """Forget all routes added by :py:meth:`add_route`."""
+        global _generation
+        _routes.clear()
+        _generation += 1
+
+    @property
+    def generation(self):
+        """Number that changes whenever a connection or route is added or
+        removed, for invalidating anything derived from them."""
+        return _generation
+
 _manager = ConnectionManager()
 
 def GetConnectionManager():
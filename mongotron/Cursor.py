@@ -1,13 +1,28 @@
 
 from __future__ import absolute_import
+
+import Queue
+import collections
+import itertools
+import sys
+import threading
+
 from pymongo.cursor import Cursor as PymongoCursor
 
+from . import columnar
+
+
 class Cursor(PymongoCursor):
 
     def __init__(self, *args, **kwargs):
         self.__wrap = None
+        self.__wrap_kwargs = {}
         if kwargs:
             self.__wrap = kwargs.pop('document_class', None)
+            # Options passed through to the document class.
+            for key in ('lazy', 'partial'):
+                if key in kwargs:
+                    self.__wrap_kwargs[key] = kwargs.pop(key)
         super(Cursor, self).__init__(*args, **kwargs)
 
     def next(self):
@@ -21,11 +36,298 @@ class Cursor(PymongoCursor):
         obj = super(Cursor, self).next()
 
         if (self.__wrap is not None) and isinstance(obj, dict):
-            return self.__wrap(obj)
+            return self.__wrap(obj, **self.__wrap_kwargs)
         return obj
 
     def __getitem__(self, index):
         obj = super(Cursor, self).__getitem__(index)
         if (self.__wrap is not None) and isinstance(obj, dict):
-            return self.__wrap(obj)
+            return self.__wrap(obj, **self.__wrap_kwargs)
         return obj
+
+    def to_columns(self, fields, dtypes=None):
+        """Read the remaining results into a dict mapping each canonical name
+        in `fields` to a column of its values, without constructing
+        :py:class:`Document <mongotron.Document>` instances. See
+        :py:mod:`mongotron.columnar` for the column types.
+
+        ::
+
+            cols = User.find({'active': True}).to_columns(['age', 'created'])
+            cols['age'].mean()
+
+        Each column's dtype follows from the field type: ``int64`` for int
+        fields, ``float64`` for float fields, ``datetime64[ms]`` for datetime
+        fields, ``bool`` for bool fields, and ``object`` otherwise. Absent
+        values are replaced by the field's entry in the class's
+        ``default_values`` if that is an immutable value, or otherwise NaN,
+        NaT or ``None``, converting int and bool columns as needed. If the
+        query has not yet run and no projection was given, only `fields` are
+        fetched.
+
+            `fields`:
+                Sequence of canonical field names.
+
+            `dtypes`:
+                Optional dict mapping field names to NumPy dtypes that
+                override the defaults.
+        """
+        doc_type = self.__wrap
+        dtypes = dtypes or {}
+        shorts = []
+        columns = []
+        for name in fields:
+            field = default = None
+            short = name
+            if doc_type is not None:
+                field = doc_type.field_types.get(name)
+                short = doc_type.long_to_short(name)
+                # Type-level defaults such as 0 would be mistaken for data.
+                if field is not None and field.shared_default and \
+                        name in doc_type.default_values:
+                    default = field.default
+            shorts.append(short)
+            columns.append(columnar.make_column(field, dtypes.get(name),
+                                                default))
+
+        if self._Cursor__fields is None and not self.__started():
+            self._Cursor__fields = dict((short, 1) for short in shorts)
+
+        appends = [(short, column.append)
+                   for short, column in zip(shorts, columns)]
+        for obj in self.__iter_stored():
+            get = obj.get
+            for short, append in appends:
+                append(get(short))
+        return dict((name, column.finish())
+                    for name, column in zip(fields, columns))
+
+    def batches(self, n):
+        """Yield the remaining results in lists of up to `n` documents. Each
+        list is taken from the cursor's buffer of fetched results at once,
+        rather than through :py:meth:`next` per result, though each document
+        is still constructed separately. If the query has not yet run, `n`
+        is also used as its batch size.
+        """
+        if not self.__started():
+            self.batch_size(n)
+        wrap = self.__wrap
+        kwargs = self.__wrap_kwargs
+        while True:
+            batch = self.__take_stored(n)
+            while batch and len(batch) < n:
+                more = self.__take_stored(n - len(batch))
+                if not more:
+                    break
+                batch.extend(more)
+            if not batch:
+                return
+            if wrap is not None:
+                batch = [wrap(obj, **kwargs) if isinstance(obj, dict) else obj
+                         for obj in batch]
+            yield batch
+
+    def raw(self):
+        """Yield the remaining results as plain dicts keyed by canonical
+        field names (see :py:meth:`Document.canonical_dict
+        <mongotron.Document.canonical_dict>`), without constructing
+        documents. Suited to read-only processing that needs no change
+        tracking."""
+        wrap = self.__wrap
+        for obj in self.__iter_stored():
+            if wrap is not None:
+                obj = wrap.canonical_dict(obj)
+            yield obj
+
+    def prefetch(self, depth=2, batch_size=100):
+        """Return a :py:class:`PrefetchCursor` that iterates the remaining
+        results while fetching later ones on a background thread.
+
+            `depth`:
+                Maximum number of fetched batches waiting to be consumed.
+
+            `batch_size`:
+                Number of documents per batch. If the query has not yet
+                run, this is also used as its batch size.
+        """
+        if not self.__started():
+            self.batch_size(batch_size)
+        return PrefetchCursor(self, depth, batch_size)
+
+    def __started(self):
+        """Return ``True`` if the query has been sent to the server."""
+        return self._Cursor__id is not None or self._Cursor__retrieved > 0
+
+    def __take_stored(self, n):
+        """Return a list of up to `n` of the remaining results as returned by
+        MongoDB, taken from those fetched by the last round trip, fetching
+        more only if none are left. Returns an empty list once the results
+        are exhausted."""
+        if self._Cursor__empty:
+            return []
+        if not self._Cursor__data and not self._refresh():
+            return []
+        # _refresh() replaces the buffer.
+        data = self._Cursor__data
+        if len(data) <= n:
+            batch = list(data)
+            data.clear()
+        else:
+            batch = [data.popleft() for _ in xrange(n)]
+        if self._Cursor__manipulate:
+            collection = self._Cursor__collection
+            fix = collection.database._fix_outgoing
+            batch = [fix(obj, collection) for obj in batch]
+        return batch
+
+    def __iter_stored(self):
+        """Yield the remaining results as returned by MongoDB."""
+        while True:
+            batch = self.__take_stored(sys.maxint)
+            if not batch:
+                return
+            for obj in batch:
+                yield obj
+
+
+class AsyncCursor(object):
+    """Asynchronous wrapper around a :py:class:`Cursor`, as returned by
+    :py:meth:`Document.afind <mongotron.Document.afind>`. Results are fetched
+    on `executor` (see :py:mod:`mongotron.executors`) in lists of up to
+    `batch_size` documents, each returned as a future by
+    :py:meth:`next_batch`, or all at once by :py:meth:`to_list`. With an
+    :py:class:`AsyncioExecutor <mongotron.executors.AsyncioExecutor>` under
+    trollius, a coroutine consumes them as::
+
+        cursor = User.afind({'active': True})
+        while True:
+            users = yield From(cursor.next_batch())
+            if not users:
+                break
+            for user in users:
+                process(user)
+    """
+    def __init__(self, cursor, executor, batch_size=100):
+        self.cursor = cursor
+        self.executor = executor
+        self.batch_size = batch_size
+
+    def _fetch(self):
+        return list(itertools.islice(self.cursor, self.batch_size))
+
+    def next_batch(self):
+        """Return a future for a list of up to `batch_size` further
+        documents, which is empty once the cursor is exhausted."""
+        return self.executor.submit(self._fetch)
+
+    def to_list(self):
+        """Return a future for a list of all remaining documents."""
+        return self.executor.submit(list, self.cursor)
+
+
+class PrefetchCursor(object):
+    """Iterator over the results of a :py:class:`Cursor`, as returned by
+    :py:meth:`Cursor.prefetch`. A background thread reads results in lists of
+    `batch_size` documents into a queue holding up to `depth` lists, so the
+    network round trips and decoding for later results overlap processing of
+    earlier ones.
+
+    ::
+
+        with User.find({'active': True}).prefetch(depth=4) as users:
+            for user in users:
+                process(user)
+
+    Exceptions raised while fetching are re-raised by :py:meth:`next` once
+    the results fetched before the failure are consumed. Call
+    :py:meth:`close`, or use the cursor as a context manager, to stop the
+    thread when abandoning iteration early.
+    """
+    #: Seconds the background thread waits on a full queue before checking
+    #: whether the cursor was closed.
+    POLL_INTERVAL = 0.1
+
+    _BATCH = 'batch'
+    _ERROR = 'error'
+    _DONE = 'done'
+
+    def __init__(self, cursor, depth=2, batch_size=100):
+        self.cursor = cursor
+        self._queue = Queue.Queue(maxsize=depth)
+        self._buffer = collections.deque()
+        self._closed = threading.Event()
+        self._finished = False
+        self._thread = threading.Thread(target=self._run,
+                                        args=(batch_size,),
+                                        name='mongotron-prefetch')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, batch_size):
+        batch = []
+        try:
+            for doc in self.cursor:
+                batch.append(doc)
+                if len(batch) == batch_size:
+                    if not self._put((self._BATCH, batch)):
+                        return
+                    batch = []
+        except BaseException:
+            # Includes GreenletExit and SystemExit, which would otherwise end
+            # the thread without a terminator, blocking the consumer forever.
+            end = (self._ERROR, sys.exc_info())
+        else:
+            end = (self._DONE, None)
+        if not batch or self._put((self._BATCH, batch)):
+            self._put(end)
+
+    def _put(self, item):
+        """Enqueue `item`, returning ``False`` if the cursor was closed
+        first."""
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=self.POLL_INTERVAL)
+                return True
+            except Queue.Full:
+                pass
+        return False
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        while not self._buffer:
+            if self._finished:
+                raise StopIteration
+            kind, value = self._queue.get()
+            if kind is self._BATCH:
+                self._buffer.extend(value)
+            elif kind is self._ERROR:
+                self.close()
+                raise value[0], value[1], value[2]
+            else:
+                self._finished = True
+        return self._buffer.popleft()
+
+    __next__ = next
+
+    def close(self):
+        """Stop the background thread, discard unconsumed results and close
+        the underlying cursor."""
+        self._finished = True
+        self._closed.set()
+        self._buffer.clear()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except Queue.Empty:
+                break
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self.cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
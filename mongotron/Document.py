@@ -1,18 +1,61 @@
 
 from __future__ import absolute_import
 
+import copy
 import logging
+import os
 import warnings
 
 from bson.objectid import ObjectId, InvalidId
+from pymongo.errors import BulkWriteError, OperationFailure
 
-from .exceptions import ValidationError
+from .exceptions import ValidationError, NotLoadedError
 from .ConnectionManager import GetConnectionManager
-from .Cursor import Cursor
+from .Cursor import Cursor, AsyncCursor
+from .IdentityMap import current_identity_map
+from . import export
+from . import executors
 from . import field_types
+from . import query
+from . import scan
 
 LOG = logging.getLogger('mongotron.Document')
 
+#: Marker for a missing value, where ``None`` is a legitimate value.
+_MISSING = object()
+
+#: Valid values for :py:attr:`Document.__reload__`.
+RELOAD_POLICIES = ('none', 'changed', 'full')
+
+#: Operations that :py:meth:`Document.apply_ops` can reproduce locally.
+_LOCAL_OPS = frozenset(['$set', '$unset', '$inc', '$push', '$pushAll',
+                        '$addToSet', '$pullAll'])
+
+
+def _touched_keys(ops):
+    """Return the set of short keys modified by the update document `ops`."""
+    keys = set()
+    for fields in ops.itervalues():
+        keys.update(fields)
+    return keys
+
+
+def _modified_documents(field, value):
+    """Return the list of :py:class:`Document` instances with pending
+    operations that are the cached expanded value `value` of `field`, or
+    elements of it."""
+    if isinstance(value, Document):
+        docs = (value,)
+    elif isinstance(getattr(field, 'element_type', None),
+                    field_types.DocumentField):
+        docs = value
+    elif isinstance(getattr(field, 'value_type', None),
+                    field_types.DocumentField):
+        docs = value.itervalues()
+    else:
+        return []
+    return [doc for doc in docs if doc is not None and doc.operations]
+
 
 class classproperty(object):
     """Equivalent to property() on a class, i.e. invoking the descriptor
@@ -32,7 +75,10 @@ class DocumentMeta(type):
     :py:attr:`Document.default_values` with any base classes.
 
     After this is done, it synthesizes a new :py:attr:`Document.field_types`
-    mapping using :py:class:`mongotron.field_types.Field` Field instances.
+    mapping using :py:class:`mongotron.field_types.Field` Field instances,
+    and a :py:attr:`Document.load_plan` used by
+    :py:meth:`Document.merge_dict`, along with the subset of it for fields
+    with defaults, :py:attr:`Document.default_plan`.
     """
     INHERITED_DICTS = ['structure', 'default_values', 'field_map']
     INHERITED_SETS = ['required', 'write_once']
@@ -53,6 +99,10 @@ class DocumentMeta(type):
         cls.check_field_map(name, attrs)
         cls.make_inverse_map(attrs)
         attrs['field_types'] = cls.make_field_types(attrs)
+        attrs['load_plan'] = cls.make_load_plan(attrs)
+        attrs['default_plan'] = tuple(entry for entry in attrs['load_plan']
+                                      if entry[3] is not _MISSING)
+        attrs['field_validators'] = cls.make_validators(attrs)
         attrs['__collection__'] = cls.make_collection_name(name, attrs)
         attrs.setdefault('__manager__', GetConnectionManager())
         attrs.setdefault('__connection__', None)
@@ -62,7 +112,10 @@ class DocumentMeta(type):
         # print '----------------------------------------'
         # pprint(attrs)
         # print '----------------------------------------'
-        return type.__new__(cls, name, bases, attrs)
+        klass = type.__new__(cls, name, bases, attrs)
+        klass._query_plans = query.PlanCache(klass.QUERY_PLAN_CACHE_SIZE)
+        klass._collections = {}
+        return klass
 
     @classmethod
     def check_field_map(cls, name, attrs):
@@ -82,8 +135,6 @@ class DocumentMeta(type):
                                 '(already used for field %r)' %\
                                 (short, canon, dct[short]))
             dct[short] = canon
-        it = attrs['field_map'].iteritems()
-        attrs['inverse_field_map'] = dict((k, v) for k, v in it)
 
     @classmethod
     def merge_carefully(cls, base, dname, attrs):
@@ -118,6 +169,41 @@ class DocumentMeta(type):
                 write_once=name in attrs['write_once'])
         return types
 
+    @classmethod
+    def make_validators(cls, attrs):
+        """Compile the validator for each field, returning a map of canonical
+        field names to validators for the fields that need validation."""
+        validators = {}
+        for name, field in attrs['field_types'].iteritems():
+            field.validator = field.compile_validator()
+            if field.validator is not None:
+                validators[name] = field.validator
+        return validators
+
+    @classmethod
+    def make_load_plan(cls, attrs):
+        """Return a tuple of ``(name, short, alt, default, shared)`` tuples
+        describing how to load each field from a MongoDB document, so
+        :py:meth:`Document.merge_dict` need not repeat the work for every
+        document. `alt` is the canonical name to try if `short` is missing, or
+        ``None`` if it is the same key. `default` is ``_MISSING`` if the field
+        has no default, otherwise either the default value itself if `shared`
+        is ``True`` (i.e. it is immutable), or a function producing it.
+        """
+        plan = []
+        for name, field in attrs['field_types'].iteritems():
+            short = attrs['field_map'].get(name, name)
+            alt = name if name != short else None
+            default = _MISSING
+            shared = False
+            if name in attrs['default_values']:
+                default = field.make
+                if field.shared_default:
+                    default = field.default
+                    shared = True
+            plan.append((name, short, alt, default, shared))
+        return tuple(plan)
+
 
 class Document(object):
     """A class with property-style access. It maps attribute access to an
@@ -159,6 +245,54 @@ class Document(object):
     #: Automatically populated by metaclass.
     field_types = {}
 
+    #: Precomputed steps used by :py:meth:`merge_dict` to load each field.
+    #: Automatically populated by metaclass.
+    load_plan = ()
+
+    #: The entries of :py:attr:`load_plan` for fields with default values,
+    #: loaded immediately even by lazy loads. Automatically populated by
+    #: metaclass.
+    default_plan = ()
+
+    #: Maximum number of compiled query translations cached per class by
+    #: :py:meth:`map_search_dict`.
+    QUERY_PLAN_CACHE_SIZE = 256
+
+    #: How a document is refreshed after :py:meth:`save` writes operations;
+    #: may be overridden per call. One of:
+    #:
+    #:  ``'full'``: load the whole document returned by the server.
+    #:  ``'changed'``: load only the fields touched by the operations.
+    #:  ``'none'``: apply the operations locally, falling back to
+    #:  ``'changed'`` if they cannot be applied locally.
+    __reload__ = 'full'
+
+    #: If ``True``, documents loaded from the database copy each field out of
+    #: the loaded dict only when it is first accessed, rather than all at
+    #: once. Useful for wide documents of which few fields are read: reading
+    #: 2 fields of a document breaks even at around two dozen fields, and is
+    #: several times faster at a few hundred. May be overridden per query by
+    #: passing ``lazy=`` to :py:meth:`find`.
+    __lazy__ = False
+
+    #: Optional :py:class:`mongotron.Cache.Cache` consulted by
+    #: :py:meth:`find_one` and :py:meth:`get_by_id` when looking up a single
+    #: document by ``_id``. Entries are invalidated by :py:meth:`save`,
+    #: :py:meth:`delete` and :py:meth:`update`.
+    __cache__ = None
+
+    #: What happens when reading a field that was excluded from a partially
+    #: loaded document (see the `only` and `exclude` options of
+    #: :py:meth:`find`). ``'raise'`` raises
+    #: :py:class:`NotLoadedError <mongotron.NotLoadedError>`, while
+    #: ``'fetch'`` loads all the missing fields with one query.
+    __unloaded__ = 'raise'
+
+    #: Executor used by the asynchronous methods (:py:meth:`asave`,
+    #: :py:meth:`afind`, :py:meth:`afind_one`, :py:meth:`aget_by_id`), or
+    #: ``None`` to use :py:func:`mongotron.executors.get_executor`.
+    __executor__ = None
+
     def validate(self):
         """Hook invoked prior to creating or updating document, but after
         :py:meth:`pre_save`, :py:meth:`pre_update` or :py:meth:`pre_insert`
@@ -166,12 +300,55 @@ class Document(object):
         does not make sense.
 
         The base implementation must be called in order to handle
-        :py:attr:`Document.required` processing.
+        :py:attr:`Document.required` processing, and validation of the fields
+        returned by :py:meth:`changed_fields`. Unchanged fields are assumed to
+        be valid, so the cost is proportional to the size of the change.
         """
-        missing = self.required.difference(self.__attributes)
+        required = self.required
+        if self.__partial is not None:
+            required = required.intersection(self.__partial)
+        for key in required:
+            self.__resolve(key)
+        missing = required.difference(self.__attributes)
         if missing:
             raise ValidationError('missing required fields: %s' %\
                                   (', '.join(missing),))
+        self.validate_fields(self.changed_fields())
+
+    def validate_fields(self, keys):
+        """Run the validator of each field named in `keys` against its
+        current value. Fields that are not set, or were validated when
+        assigned, are skipped, and list and set fields only modified by
+        queued ``$push``, ``$addToSet`` or ``$pullAll`` operations have just
+        their added elements validated."""
+        validators = self.field_validators
+        unchecked = self.__unchecked
+        for key in keys:
+            validator = validators.get(key)
+            if validator is None or key in self._validated or \
+                    key not in self.__attributes:
+                continue
+            if key in unchecked and key not in self.__dirty_fields:
+                check_elem = self.field_types[key].element_validator
+                if check_elem is not None:
+                    for elem in unchecked[key]:
+                        check_elem(elem)
+            else:
+                validator(getattr(self, key))
+
+    def changed_fields(self):
+        """Return the set of canonical names of fields that were assigned,
+        have pending operations, or hold a sub-document modified in place
+        since the document was loaded or last saved."""
+        keys = set(self.__dirty_fields)
+        for fields in self.__ops.itervalues():
+            for short in fields:
+                keys.add(self.short_to_long(short.split('.', 1)[0]))
+        field_types = self.field_types
+        for key, value in self._expanded.iteritems():
+            if _modified_documents(field_types[key], value):
+                keys.add(key)
+        return keys
 
     def on_load(self):
         """Hook invoked while document is being initialized.
@@ -215,11 +392,52 @@ class Document(object):
 
     @classproperty
     def _dbcollection(cls):
-        conn = cls.__manager__.get_connection(cls.__connection__, True)
+        return cls.get_collection('write')
+
+    @classmethod
+    def connection_name(cls, op='write'):
+        """Return the name of the connection used for operations of type
+        `op`, according to the routes of :py:attr:`__manager__` (see
+        :py:meth:`ConnectionManager.add_route`)."""
+        route = cls.__manager__.get_route(cls, op)
+        if route is not None and route[0] is not None:
+            return route[0]
+        return cls.__connection__
+
+    @classmethod
+    def get_collection(cls, op='write'):
+        """Return the collection used for operations of type `op`
+        (``'read'``, ``'write'`` or ``'scan'``), on the connection chosen by
+        :py:meth:`connection_name` and configured with any route options.
+
+        Collections are cached per class until a connection or route is
+        registered with :py:attr:`__manager__`, or the process forks.
+        """
+        key = (cls.__manager__.generation, os.getpid())
+        cached = cls._collections.get(op)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        col = cls._resolve_collection(op)
+        cls._collections[op] = (key, col)
+        return col
+
+    @classmethod
+    def _resolve_collection(cls, op):
+        route = cls.__manager__.get_route(cls, op)
+        name = cls.__connection__
+        options = None
+        if route is not None:
+            name = route[0] or name
+            options = route[1]
+        conn = cls.__manager__.get_connection(name, True)
         try:
-            return conn[cls.__db__][cls.__collection__]
+            col = conn[cls.__db__][cls.__collection__]
         except AttributeError:
             raise AttributeError('__db__ field is not set on your object!')
+        if options:
+            for key, value in options.iteritems():
+                setattr(col, key, value)
+        return col
 
     @classmethod
     def long_to_short(cls, long_key):
@@ -233,34 +451,164 @@ class Document(object):
         `short_key` if no canonical version exists."""
         return cls.inverse_field_map.get(short_key, short_key)
 
-    def merge_dict(self, dct):
-        """Load keys and collapsed values from `dct`.
-        """
-        for key, field in self.field_types.iteritems():
-            short = self.long_to_short(key)
-            if short in dct:
-                self.__attributes[key] = dct[short]
-            elif key in dct:
-                self.__attributes[key] = dct[key]
-            elif key in self.default_values:
-                self.set(key, field.make())
+    @classmethod
+    def canonical_dict(cls, dct):
+        """Return a copy of the stored dict `dct` keyed by canonical field
+        names, including within sub-documents and lists of sub-documents.
+        Values are otherwise left as stored."""
+        inverse = cls.inverse_field_map
+        types = cls.field_types
+        x = {}
+        for short, value in dct.iteritems():
+            key = inverse.get(short, short)
+            sub_type = query.sub_document(types.get(key))
+            if sub_type is not None:
+                if isinstance(value, dict):
+                    value = sub_type.canonical_dict(value)
+                elif isinstance(value, list):
+                    value = [sub_type.canonical_dict(elem)
+                             if isinstance(elem, dict) else elem
+                             for elem in value]
+            x[key] = value
+        return x
 
-    def load_dict(self, dct):
+    def merge_dict(self, dct, plan=None):
+        """Load keys and collapsed values from `dct`, for the fields described
+        by `plan` (by default :py:attr:`load_plan`).
+        """
+        attrs = self.__attributes
+        partial = self.__partial
+        self._expanded.clear()
+        get = dct.get
+        if plan is None:
+            plan = self.load_plan
+        for key, short, alt, default, shared in plan:
+            value = get(short, _MISSING)
+            if value is _MISSING and alt is not None:
+                value = get(alt, _MISSING)
+            if value is not _MISSING:
+                attrs[key] = value
+            elif default is not _MISSING and \
+                    (partial is None or key in partial):
+                self.set(key, default if shared else default())
+
+    def load_dict(self, dct, lazy=False, partial=None):
         """Reset the document to an empty state, then load keys and values from
-        the dictionary `doc`."""
+        the dictionary `doc`.
+
+            `lazy`:
+                If ``True``, keep a reference to `dct` and only copy each
+                field out of it when first accessed. Fields with default
+                values are still loaded immediately.
+
+            `partial`:
+                If not ``None``, the set of canonical field names `dct` was
+                loaded with, because the query used a projection. Other fields
+                are treated according to :py:attr:`__unloaded__`.
+        """
         self.clear_ops()
         self.__attributes = {}
-        self.merge_dict(dct)
+        #: Map of field names to values produced by Field.__get__, so repeated
+        #: reads return the same object.
+        self._expanded = {}
+        # Map of field names to collapsed lists copied by _apply_delta(), so
+        # later deltas may modify them in place.
+        self.__owned = {}
+        self.__lazy_src = None
+        self.__partial = partial
+        if lazy:
+            # Fields with defaults are loaded now, so missing ones are set.
+            self.merge_dict(dct, self.default_plan)
+            self.__lazy_src = dct
+            self.__resolved = set(self.default_values)
+        else:
+            self.merge_dict(dct)
         self.__identity = self.identity()
 
+    def __resolve(self, key):
+        """If the document was loaded lazily, copy the field `key` from the
+        loaded dict the first time it is needed."""
+        src = self.__lazy_src
+        if src is None or key in self.__resolved:
+            return
+        self.__resolved.add(key)
+        if key in self.field_types:
+            short = self.field_map.get(key, key)
+            if short in src:
+                self.__attributes[key] = src[short]
+            elif key in src:
+                self.__attributes[key] = src[key]
+
+    def __resolve_all(self):
+        """Copy every remaining field from a lazily loaded dict."""
+        if self.__lazy_src is not None:
+            for key in self.field_types:
+                self.__resolve(key)
+            self.__lazy_src = None
+
     def to_json_dict(self, **kwargs):
-        return dict()
+        """Return a dict mapping canonical field names to the document's
+        values, expanded through their field types and converted to types
+        that can be encoded as JSON (see
+        :py:func:`mongotron.export.json_value`)."""
+        self.flush_expanded()
+        self.__resolve_all()
+        x = {}
+        for key, value in self.__attributes.iteritems():
+            field = self.field_types.get(key)
+            if field is not None:
+                value = field.expand(value)
+            x[key] = export.json_value(value, field)
+        return x
 
     def from_json_dict(self, json_dict):
         pass
 
-    def __init__(self, doc=None):
-        self.load_dict(doc or {})
+    @property
+    def partial(self):
+        """``True`` if the document was loaded with only some of its fields
+        (see :py:meth:`find`)."""
+        return self.__partial is not None
+
+    def __check_loaded(self, key):
+        """Handle an access to `key` according to :py:attr:`__unloaded__` if
+        it was not loaded with a partial document."""
+        if self.__partial is None or key in self.__partial or \
+                key not in self.field_types:
+            return
+        if self.__unloaded__ != 'fetch':
+            raise NotLoadedError('%r was not loaded for this %s' %\
+                                 (key, self.__class__.__name__))
+        self.fetch_unloaded()
+
+    def __mark_loaded(self, key):
+        """Note that `key` of a partial document now has a known value."""
+        if self.__partial is not None and key not in self.__partial:
+            self.__partial = self.__partial.union([key])
+
+    def fetch_unloaded(self):
+        """Load any fields missing from a partial document with one query,
+        making it a complete document."""
+        if self.__partial is None:
+            return
+        missing = [key for key in self.field_types
+                   if key not in self.__partial]
+        fields = dict((self.long_to_short(key), 1) for key in missing)
+        res = self.get_collection('read').find_one({'_id': self._id},
+                                                   fields=fields)
+        res = res or {}
+        self.__partial = None
+        for key in missing:
+            short = self.long_to_short(key)
+            if short in res:
+                self.__attributes[key] = res[short]
+            elif key in self.default_values:
+                self.set(key, self.field_types[key].make())
+
+    def __init__(self, doc=None, lazy=None, partial=None):
+        if lazy is None:
+            lazy = self.__lazy__
+        self.load_dict(doc or {}, lazy=lazy and bool(doc), partial=partial)
         if doc:
             self.on_load()
 
@@ -275,9 +623,12 @@ class Document(object):
             getattr(self.__class__, name).__set__(self, value)
 
     def __repr__(self):
+        self.__resolve_all()
         return "%s(%r)" % (self.__class__.__name__, self.__attributes)
 
     def __contains__(self, key):
+        self.__check_loaded(key)
+        self.__resolve(key)
         return key in self.__attributes
 
     def __eq__(self, other):
@@ -297,6 +648,9 @@ class Document(object):
     def get(self, key):
         """Fetch the value of `key` from the underlying document, returning
         ``None`` if the value does not exist."""
+        self.__check_loaded(key)
+        if self.__lazy_src is not None:
+            self.__resolve(key)
         return self.__attributes.get(key)
 
     # mongo operation wrappers!
@@ -313,6 +667,7 @@ class Document(object):
         # We should probably make this smarter so you can't set a top level
         # array and a component at the same time though if you're doing that,
         # your code is broken anyway
+        self._expanded.pop(key, None)
         key = self.long_to_short(key)
 
         op_dict = self.__ops.setdefault(op, {})
@@ -338,17 +693,33 @@ class Document(object):
             else:
                 param_list.append(val)
 
+    def flush_expanded(self):
+        """Mark any fields for ``$set`` whose cached value is, or contains, a
+        :py:class:`Document` that was modified in place."""
+        for key, value in self._expanded.items():
+            field = self.field_types[key]
+            # Sub-document operations include its own modified sub-documents.
+            docs = _modified_documents(field, value)
+            if docs:
+                self.set(key, field.collapse(value))
+                for doc in docs:
+                    doc.clear_ops()
+                self._expanded[key] = value
+
     @property
     def operations(self):
-        # construct the $set changes
-        ops = self.__ops.copy()
+        self.flush_expanded()
+        # construct the $set changes, dropping operators that set() emptied
+        ops = dict((op, fields) for op, fields in self.__ops.iteritems()
+                   if fields)
 
         x = {}
         for key in self.__dirty_fields:
             if key in self.__attributes:
                 x[self.long_to_short(key)] = self.__attributes[key]
 
-        ops['$set'] = x
+        if x:
+            ops['$set'] = x
         return ops
 
 
@@ -358,6 +729,13 @@ class Document(object):
         """
         self.__ops = {}
         self.__dirty_fields = set()
+        self.__local_fields = set()
+        #: Names of fields whose value was validated by Field.__set__ when
+        #: assigned, and need not be validated again by validate().
+        self._validated = set()
+        # Map of list and set field names with operations queued by
+        # record_delta() to the expanded elements they added.
+        self.__unchecked = {}
 
 
     # MONGO MAGIC HAPPENS HERE!
@@ -377,6 +755,11 @@ class Document(object):
         """
         if value is None:
             return self.unset(key)
+        self.__mark_loaded(key)
+        if self.__lazy_src is not None:
+            self.__resolve(key)
+        self._expanded.pop(key, None)
+        self._validated.discard(key)
         self.__dirty_fields.add(key)
         self.__attributes[key] = value
         # Everything about this is stupid. Needs general solution, see bug #1
@@ -384,6 +767,65 @@ class Document(object):
         for op, fields in self.__ops.iteritems():
             fields.pop(short, None)
 
+    def record_delta(self, key, op, values, container):
+        """Invoked by the change tracking `container` returned for the list or
+        set field `key` after it was modified in a way expressible as the
+        operation `op` applied to the expanded elements `values`: ``$push``
+        and ``$addToSet`` add them, ``$pullAll`` removes them.
+
+        The operation is queued instead of rewriting the whole field with
+        ``$set``, unless the field already has a different operation pending,
+        the document is unsaved, or the field does not have a single element
+        type, in which case the whole field is marked for ``$set``.
+        """
+        field = self.field_types[key]
+        element_type = getattr(field, 'element_type', None)
+        short = self.long_to_short(key)
+        pending = [o for o, fields in self.__ops.iteritems() if short in fields]
+        if self._id is None or element_type is None or \
+                key in self.__dirty_fields or pending not in ([], [op]):
+            self.set(key, field.collapse(container))
+            return
+
+        unchecked = self.__unchecked.setdefault(key, [])
+        if op != '$pullAll':
+            unchecked.extend(values)
+        values = [element_type.collapse(value) for value in values]
+        self._apply_delta(key, op, values, field, container)
+        op_dict = self.__ops.setdefault(op, {})
+        if op == '$pullAll':
+            op_dict.setdefault(short, []).extend(values)
+        else:
+            op_dict.setdefault(short, {'$each': []})['$each'].extend(values)
+        self.__local_fields.add(short)
+
+    def _apply_delta(self, key, op, values, field, container):
+        """Update the collapsed value of `key` in place with the collapsed
+        `values` recorded by :py:meth:`record_delta`, rather than collapsing
+        the whole `container` again."""
+        stored = self.__attributes.get(key)
+        if stored is container:
+            # Basic lists collapse to the container itself.
+            return
+        if isinstance(stored, list):
+            if self.__owned.get(key) is not stored:
+                # The loaded list may be shared with the caller's dict or
+                # another document, so copy it once before modifying it.
+                stored = self.__owned[key] = list(stored)
+                self.__attributes[key] = stored
+            if op != '$pullAll':
+                stored.extend(values)
+                return
+            try:
+                # The container only reports values it no longer holds, and
+                # so held once.
+                for value in values:
+                    stored.remove(value)
+                return
+            except ValueError:
+                pass
+        self.__attributes[key] = field.collapse(container)
+
     def unset(self, key):
         """Unconditionally remove the underlying document field `key`.
 
@@ -397,6 +839,9 @@ class Document(object):
             >>> # Equivalent to instance.unset('attr'):
             >>> del instance.attr
         """
+        self.__mark_loaded(key)
+        self.__resolve(key)
+        self._expanded.pop(key, None)
         self.__attributes.pop(key, None)
         self.add_operation('$unset', key, 1)
 
@@ -442,12 +887,112 @@ class Document(object):
         """
         return {'_id': self._id or ObjectId()}
 
-    def save(self, safe=True):
+    def insert_dict(self):
+        """Return the dict to be inserted for this document if it is unsaved
+        and has no pending operations requiring the server to compute its
+        final state, otherwise ``None``. The document's ``_id`` is generated
+        on the client."""
+        if self._id is not None or self.__ops:
+            return None
+        dct = dict(self.__identity)
+        dct.update(self.document_as_dict())
+        dct.setdefault('_id', ObjectId())
+        return dct
+
+    def after_insert(self, dct):
+        """Record the ``_id`` of the inserted dict `dct` (as returned by
+        :py:meth:`insert_dict`) once it has been written."""
+        self.__attributes['_id'] = dct['_id']
+        self._expanded.pop('_id', None)
+        self.__identity = self.identity()
+
+    def can_apply_ops(self, ops):
+        """Return ``True`` if the operations `ops` can be reproduced locally
+        by :py:meth:`apply_ops` after they are written."""
+        if self.__partial is not None:
+            for short in _touched_keys(ops):
+                if self.short_to_long(short) not in self.__partial:
+                    return False
+        return '_id' in self.__identity and _LOCAL_OPS.issuperset(ops)
+
+    def apply_ops(self, ops):
+        """Apply the written operations `ops` to the local document, rather
+        than reloading it from the server."""
+        attrs = self.__attributes
+        for op, fields in ops.iteritems():
+            for short, val in fields.iteritems():
+                if short in self.__local_fields:
+                    # Already reflected by record_delta().
+                    continue
+                key = self.short_to_long(short)
+                self.__resolve(key)
+                self._expanded.pop(key, None)
+                if op == '$inc':
+                    attrs[key] = attrs.get(key, 0) + val
+                elif op == '$push':
+                    attrs[key] = list(attrs.get(key) or []) + val['$each']
+                elif op == '$pushAll':
+                    attrs[key] = list(attrs.get(key) or []) + val
+                elif op == '$addToSet':
+                    lst = list(attrs.get(key) or [])
+                    for elem in val['$each']:
+                        if elem not in lst:
+                            lst.append(elem)
+                    attrs[key] = lst
+                elif op == '$pullAll':
+                    attrs[key] = [elem for elem in attrs.get(key) or []
+                                  if elem not in val]
+        attrs['_id'] = self.__identity['_id']
+        self._expanded.pop('_id', None)
+        self.__identity = self.identity()
+
+    def merge_changed(self, res, ops):
+        """Load only the fields touched by the operations `ops` from the
+        server document `res`."""
+        for short in _touched_keys(ops):
+            key = self.short_to_long(short)
+            self.__mark_loaded(key)
+            self.__resolve(key)
+            self._expanded.pop(key, None)
+            if short in res:
+                self.__attributes[key] = res[short]
+            else:
+                self.__attributes.pop(key, None)
+        self.__attributes['_id'] = res['_id']
+        self._expanded.pop('_id', None)
+        self.__identity = self.identity()
+
+    def write_ops(self, col, ops, reload):
+        """Apply the operations `ops` to the stored document in `col`, then
+        refresh the local document according to the `reload` policy (see
+        :py:attr:`__reload__`)."""
+        if reload not in RELOAD_POLICIES:
+            raise ValueError('reload must be one of %s, got %r' %\
+                             (', '.join(RELOAD_POLICIES), reload))
+
+        if reload == 'none' and self.can_apply_ops(ops):
+            col.update(self.__identity, ops, upsert=True)
+            self.apply_ops(ops)
+        elif reload == 'full':
+            res = col.find_and_modify(query=self.__identity,
+                                      update=ops, upsert=True, new=True)
+            self.load_dict(res)
+        else:
+            fields = dict.fromkeys(_touched_keys(ops), 1)
+            res = col.find_and_modify(query=self.__identity, update=ops,
+                                      upsert=True, new=True, fields=fields)
+            self.merge_changed(res, ops)
+
+    def save(self, safe=True, reload=None):
         """Insert the document into the underlying collection if it is unsaved,
         otherwise update the existing document.
 
             `safe`:
                 Does nothing, yet.
+
+            `reload`:
+                How to refresh the document after writing; defaults to
+                :py:attr:`__reload__`.
         """
         self.pre_save()
 
@@ -462,12 +1007,22 @@ class Document(object):
 
         self.validate()
         col = self._dbcollection
-        ops = self.operations
 
-        if ops:
-            res = col.find_and_modify(query=self.__identity,
-                                      update=ops, upsert=True, new=True)
-            self.load_dict(res)
+        # Plain inserts need nothing computed by the server, so skip the
+        # findAndModify round trip and keep our local state.
+        insert = self.insert_dict()
+        if insert is not None:
+            col.insert(insert)
+            self.after_insert(insert)
+        else:
+            ops = self.operations
+            if ops:
+                self.write_ops(col, ops, reload or self.__reload__)
+
+        self.invalidate_cache(self._id)
+        imap = current_identity_map()
+        if imap is not None:
+            imap.add(self)
 
         if new:
             self.post_insert()
@@ -477,6 +1032,150 @@ class Document(object):
         self.clear_ops()
         self.post_save()
 
+    @classmethod
+    def save_many(cls, docs, ordered=False, reload=None):
+        """Save each Document in `docs` using a single bulk write per
+        collection, rather than one :py:meth:`save` round trip per document.
+        Hooks and :py:meth:`validate` run in the same order as for
+        :py:meth:`save`.
+
+        A failure of one document does not prevent the remaining documents
+        from being saved. Returns a list of ``(document, exception)`` tuples
+        for each document that could not be saved, or that was saved but
+        whose :py:meth:`post_insert`, :py:meth:`post_update` or
+        :py:meth:`post_save` hook raised; the list is empty on success.
+
+            `ordered`:
+                If ``True``, documents are written in order and writing to a
+                collection stops at the first error; documents that were not
+                attempted are reported as failures.
+
+            `reload`:
+                How to refresh each document after writing; defaults to its
+                class :py:attr:`__reload__`.
+        """
+        failures = []
+        batches = {}
+        for doc in docs:
+            new = doc._id is None
+            try:
+                doc.pre_save()
+                if new:
+                    doc.pre_insert()
+                else:
+                    doc.pre_update()
+                doc.validate()
+                col = doc._dbcollection
+                policy = reload or doc.__reload__
+                if policy not in RELOAD_POLICIES:
+                    raise ValueError('reload must be one of %s, got %r' %\
+                                     (', '.join(RELOAD_POLICIES), policy))
+            except Exception as e:
+                failures.append((doc, e))
+                continue
+
+            key = (doc.connection_name('write'), col.full_name)
+            batch = batches.setdefault(key, (col, []))
+            batch[1].append((doc, new, doc.operations, doc.insert_dict(),
+                             policy))
+
+        for col, pending in batches.itervalues():
+            failures.extend(cls._bulk_write(col, pending, ordered))
+        return failures
+
+    @classmethod
+    def _bulk_write(cls, col, pending, ordered):
+        """Issue the writes for `pending` ``(doc, new, ops, insert, reload)``
+        tuples against `col` as one bulk operation, refresh the resulting
+        documents and fire their post_* hooks. Return a list of ``(document,
+        exception)`` failures."""
+        if ordered:
+            bulk = col.initialize_ordered_bulk_op()
+        else:
+            bulk = col.initialize_unordered_bulk_op()
+
+        writes = []
+        for item in pending:
+            doc, new, ops, insert, reload = item
+            if insert is not None:
+                bulk.insert(insert)
+            elif ops:
+                bulk.find(doc.__identity).upsert().update_one(ops)
+            else:
+                continue
+            writes.append(item)
+
+        errors = {}
+        if writes:
+            try:
+                bulk.execute()
+            except BulkWriteError as e:
+                for error in e.details.get('writeErrors', []):
+                    errors[error['index']] = OperationFailure(
+                        error.get('errmsg'), error.get('code'), error)
+                if ordered and errors:
+                    first = min(errors)
+                    for idx in xrange(first + 1, len(writes)):
+                        errors[idx] = OperationFailure(
+                            'not attempted due to an earlier error')
+            except Exception as e:
+                errors = dict.fromkeys(xrange(len(writes)), e)
+
+        failed = set(id(writes[idx][0]) for idx in errors)
+
+        refetch = []
+        fields = {}
+        for idx, (doc, new, ops, insert, reload) in enumerate(writes):
+            if idx in errors:
+                continue
+            if insert is not None:
+                doc.after_insert(insert)
+            elif reload == 'none' and doc.can_apply_ops(ops):
+                doc.apply_ops(ops)
+            else:
+                refetch.append((doc, ops, reload))
+                if fields is not None and reload == 'full':
+                    fields = None
+                elif fields is not None:
+                    fields.update(dict.fromkeys(_touched_keys(ops), 1))
+
+        if refetch:
+            ids = [doc.__identity['_id'] for doc, ops, reload in refetch]
+            found = dict((res['_id'], res) for res in
+                         col.find({'_id': {'$in': ids}}, fields=fields))
+            for doc, ops, reload in refetch:
+                res = found.get(doc.__identity['_id'])
+                if res is None:
+                    continue
+                if reload == 'full':
+                    doc.load_dict(res)
+                else:
+                    doc.merge_changed(res, ops)
+
+        failures = [(writes[idx][0], errors[idx]) for idx in sorted(errors)]
+        imap = current_identity_map()
+        for doc, new, ops, insert, reload in pending:
+            if id(doc) in failed:
+                continue
+            doc.invalidate_cache(doc._id)
+            if imap is not None:
+                imap.add(doc)
+            # The document was written, so a failing hook must not stop the
+            # remaining documents from being finished.
+            try:
+                try:
+                    if new:
+                        doc.post_insert()
+                    else:
+                        doc.post_update()
+                finally:
+                    doc.clear_ops()
+                doc.post_save()
+            except Exception as e:
+                failures.append((doc, e))
+
+        return failures
+
     def delete(self):
         """Delete the underlying document. Returns ``True`` if the document was
         deleted, otherwise ``False`` if it did not exist.
@@ -484,6 +1183,10 @@ class Document(object):
         # TODO: parse returned ack dict to ensure a deletion occurred.
         assert self._id, 'Cannot delete unsaved Document'
         self._dbcollection.remove({'_id':self._id})
+        self.invalidate_cache(self._id)
+        imap = current_identity_map()
+        if imap is not None:
+            imap.discard(self)
         return True
 
     @classmethod
@@ -500,24 +1203,44 @@ class Document(object):
 
     @classmethod
     def map_search_dict(cls, search_dict):
-        newdict = {}
-        for k in search_dict:
-            v = search_dict[k]
-
-            if isinstance(v, dict):
-                v = cls.map_search_dict(v)
-            elif isinstance(v, list):
-                v = cls.map_search_list(v)
+        """Translate the query `search_dict` from canonical to short field
+        names. Dotted paths are mapped through the field maps of any
+        sub-documents they traverse, and operators are left alone.
 
-            k = cls.long_to_short(k)
-            newdict[k] = v
-
-        return newdict
+        The translation of each distinct set of query keys is compiled once
+        and cached per class, holding at most
+        :py:attr:`QUERY_PLAN_CACHE_SIZE` plans.
+        """
+        return query.translate_query(cls, search_dict, cls._query_plans)
 
     @classmethod
     def find(cls, *args, **kwargs):
         """Like :py:meth:`Collection.find <pymongo.collection.Collection.find>`
+
+            `lazy`:
+                If given, overrides :py:attr:`__lazy__` for the returned
+                documents.
+
+            `only`:
+                List of canonical field names to load; documents are returned
+                partially loaded. Saving a partial document only writes the
+                fields that were changed.
+
+            `exclude`:
+                List of canonical field names not to load; documents are
+                returned partially loaded.
+
+            `route`:
+                Type of operation used to choose the collection (see
+                :py:meth:`get_collection`); ``'read'`` by default, or
+                ``'scan'`` for bulk reads.
         """
+        only = kwargs.pop('only', None)
+        exclude = kwargs.pop('exclude', None)
+        if only is not None or exclude is not None:
+            kwargs['fields'], kwargs['partial'] = \
+                cls.make_projection(only, exclude)
+
         if 'spec' in kwargs:
             kwargs['spec'] = cls.map_search_dict(kwargs['spec'])
 
@@ -525,19 +1248,41 @@ class Document(object):
         if len(args):
             args[0] = cls.map_search_dict(args[0])
 
-        if 'slave_okay' not in kwargs and hasattr(cls._dbcollection, 'slave_okay'):
-            kwargs['slave_okay'] = cls._dbcollection.slave_okay
-        if 'read_preference' not in kwargs and hasattr(cls._dbcollection, 'read_preference'):
-            kwargs['read_preference'] = cls._dbcollection.read_preference
-        if 'tag_sets' not in kwargs and hasattr(cls._dbcollection, 'tag_sets'):
-            kwargs['tag_sets'] = cls._dbcollection.tag_sets
+        col = cls.get_collection(kwargs.pop('route', 'read'))
+        if 'slave_okay' not in kwargs and hasattr(col, 'slave_okay'):
+            kwargs['slave_okay'] = col.slave_okay
+        if 'read_preference' not in kwargs and hasattr(col, 'read_preference'):
+            kwargs['read_preference'] = col.read_preference
+        if 'tag_sets' not in kwargs and hasattr(col, 'tag_sets'):
+            kwargs['tag_sets'] = col.tag_sets
         if 'secondary_acceptable_latency_ms' not in kwargs and \
-                hasattr(cls._dbcollection, 'secondary_acceptable_latency_ms'):
+                hasattr(col, 'secondary_acceptable_latency_ms'):
             kwargs['secondary_acceptable_latency_ms'] = (
-                cls._dbcollection.secondary_acceptable_latency_ms
+                col.secondary_acceptable_latency_ms
             )
 
-        return Cursor(cls._dbcollection, document_class=cls, *args, **kwargs)
+        return Cursor(col, document_class=cls, *args, **kwargs)
+
+    @classmethod
+    def make_projection(cls, only=None, exclude=None):
+        """Return a tuple of ``(fields, loaded)``, where `fields` is a MongoDB
+        projection for the canonical field names in `only` or `exclude`, and
+        `loaded` is the set of canonical field names it will load."""
+        if (only is None) == (exclude is None):
+            raise ValueError('exactly one of only or exclude must be given')
+        unknown = set(only or exclude).difference(cls.field_types)
+        if unknown:
+            raise ValueError('unknown fields: %s' % (', '.join(unknown),))
+
+        if only is not None:
+            loaded = frozenset(only).union(['_id'])
+            fields = dict((cls.long_to_short(key), 1) for key in loaded)
+        else:
+            if '_id' in exclude:
+                raise ValueError('_id cannot be excluded')
+            loaded = frozenset(cls.field_types).difference(exclude)
+            fields = dict((cls.long_to_short(key), 0) for key in exclude)
+        return fields, loaded
 
     @classmethod
     def find_one(cls, spec_or_id=None, *args, **kwargs):
@@ -553,16 +1298,65 @@ class Document(object):
         if len(args):
             args[0] = cls.map_search_dict(args[0])
 
-        collection = cls._dbcollection
-        #thing = collection.find_one(*args,**kwargs)
-
         if spec_or_id is not None and not isinstance(spec_or_id, dict):
             spec_or_id = {"_id": spec_or_id}
 
+        if cls.__cache__ is not None and not (args or kwargs) and \
+                spec_or_id is not None and spec_or_id.keys() == ['_id'] and \
+                not isinstance(spec_or_id['_id'], dict):
+            return cls.cached_find_one(spec_or_id['_id'])
+
         for result in cls.find(spec_or_id, *args, **kwargs).limit(-1):
             return result
         return None
 
+    @classmethod
+    def cache_key(cls, oid):
+        """Return the :py:attr:`__cache__` key for the document with _id
+        `oid`."""
+        return (cls.__db__, cls.__collection__, oid)
+
+    @classmethod
+    def cache_store(cls, dct):
+        """Store a private copy of the document `dct`, as loaded from the
+        database, in :py:attr:`__cache__`."""
+        cls.__cache__.set(cls.cache_key(dct['_id']), copy.deepcopy(dct))
+
+    @classmethod
+    def cache_load(cls, oid):
+        """Return a new instance built from a copy of the document with _id
+        `oid` in :py:attr:`__cache__`, or ``None`` if it is not cached.
+        Copying keeps changes to the instance out of the cache."""
+        dct = cls.__cache__.get(cls.cache_key(oid))
+        if dct is not None:
+            return cls(copy.deepcopy(dct))
+
+    @classmethod
+    def cached_find_one(cls, oid):
+        """Return the document with _id `oid` from :py:attr:`__cache__`,
+        querying and caching it on a miss. Returns ``None`` if no such
+        document exists."""
+        doc = cls.cache_load(oid)
+        if doc is None:
+            dct = cls.get_collection('read').find_one({'_id': oid})
+            if dct is None:
+                return None
+            cls.cache_store(dct)
+            doc = cls(dct)
+        return doc
+
+    @classmethod
+    def invalidate_cache(cls, oid=None):
+        """Forget the cached document with _id `oid`, or every cached
+        document if `oid` is ``None``. Does nothing if :py:attr:`__cache__`
+        is not set."""
+        if cls.__cache__ is None:
+            return
+        if oid is None:
+            cls.__cache__.clear()
+        else:
+            cls.__cache__.delete(cls.cache_key(oid))
+
     @classmethod
     def update(cls, spec, document, **kwargs):
         """Modify existing documents matching `spec` using the operations from
@@ -571,28 +1365,172 @@ class Document(object):
         Like :py:meth:`Collection.update <pymongo.collection.Collection.update>`
         """
         #TODO: implement update
-        return cls._dbcollection.update(spec, document, **kwargs)
+        res = cls._dbcollection.update(spec, document, **kwargs)
+        if cls.__cache__ is not None:
+            oid = spec.get('_id')
+            if isinstance(oid, dict) and oid.keys() == ['$in']:
+                for elem in oid['$in']:
+                    cls.invalidate_cache(elem)
+            elif oid is not None and not isinstance(oid, dict):
+                cls.invalidate_cache(oid)
+            else:
+                cls.invalidate_cache()
+        return res
 
     @classmethod
     def get_by_id(cls, oid):
         """
         Get a document by a specific ID. This is mapped to the _id field. You
         can pass a string or an ObjectId.
+
+        If an :py:class:`IdentityMap <mongotron.IdentityMap>` is active, a
+        document it already holds is returned without querying.
+        """
+        oid = cls.to_object_id(oid)
+        if oid is None:
+            return None
+
+        imap = current_identity_map()
+        if imap is not None:
+            doc = imap.get(cls, oid)
+            if doc is None:
+                doc = cls.find_one({'_id':oid})
+                if doc is not None:
+                    imap.add(doc)
+            return doc
+
+        return cls.find_one({'_id':oid})
+
+    @classmethod
+    def get_many(cls, oids, preserve_order=True, missing='skip',
+                 chunk_size=1000):
+        """Get the documents for a list of IDs, using one ``$in`` query per
+        `chunk_size` IDs rather than one query each. Like
+        :py:meth:`get_by_id`, IDs may be strings or ObjectIds, and an active
+        :py:class:`IdentityMap <mongotron.IdentityMap>` or
+        :py:attr:`__cache__` is consulted before querying.
+
+            `preserve_order`:
+                If ``True``, return documents in the order of `oids`,
+                otherwise in no particular order without duplicates.
+
+            `missing`:
+                ``'skip'`` to omit IDs with no document from the result, or
+                ``'none'`` to return ``None`` in their place. Only meaningful
+                if `preserve_order` is ``True``.
         """
-        # Convert id to ObjectId
+        if missing not in ('skip', 'none'):
+            raise ValueError("missing must be 'skip' or 'none', got %r" %\
+                             (missing,))
+
+        oids = map(cls.to_object_id, oids)
+        imap = current_identity_map()
+        cache = cls.__cache__
+        found = {}
+        todo = []
+        for oid in oids:
+            if oid is None or oid in found:
+                continue
+            doc = None
+            if imap is not None:
+                doc = imap.get(cls, oid)
+            if doc is None and cache is not None:
+                doc = cls.cache_load(oid)
+            found[oid] = doc
+            if doc is None:
+                todo.append(oid)
+
+        col = cls.get_collection('read')
+        for i in xrange(0, len(todo), chunk_size):
+            for dct in col.find({'_id': {'$in': todo[i:i + chunk_size]}}):
+                if cache is not None:
+                    cls.cache_store(dct)
+                found[dct['_id']] = cls(dct)
+
+        if imap is not None:
+            for doc in found.itervalues():
+                if doc is not None:
+                    imap.add(doc)
+
+        if not preserve_order:
+            return [doc for doc in found.itervalues() if doc is not None]
+        docs = [found.get(oid) for oid in oids]
+        if missing == 'skip':
+            docs = [doc for doc in docs if doc is not None]
+        return docs
+
+    @staticmethod
+    def to_object_id(oid):
+        """Convert the string or ObjectId `oid` to an ObjectId, returning
+        ``None`` if it is a string that is not a valid ObjectId."""
         if isinstance(oid, basestring):
             try:
-                oid = ObjectId(oid)
-            except:
+                return ObjectId(oid)
+            except (InvalidId, TypeError):
                 return None
         elif not isinstance(oid, ObjectId):
             raise ValueError('oid should be an ObjectId or string')
+        return oid
 
-        return cls.find_one({'_id':oid})
+    @classmethod
+    def parallel_scan(cls, spec, fn, workers=None, partitions=None,
+                      reduce=None, initial=None, connect=None):
+        """Apply `fn` to every document matching the query `spec` using a pool
+        of worker processes, each scanning a range of ``_id`` values. See
+        :py:func:`mongotron.scan.parallel_scan` for the arguments.
+
+        ::
+
+            def word_count(post):
+                return len(post.body.split())
+
+            total = Post.parallel_scan({'published': True}, word_count,
+                                       workers=8, reduce=operator.add,
+                                       initial=0)
+        """
+        return scan.parallel_scan(cls, spec, fn, workers, partitions,
+                                  reduce, initial, connect)
+
+    @classmethod
+    def get_executor(cls):
+        """Return the executor used by the asynchronous methods."""
+        return cls.__executor__ or executors.get_executor()
+
+    def asave(self, *args, **kwargs):
+        """Like :py:meth:`save`, but run on :py:meth:`get_executor`,
+        returning a future."""
+        return self.get_executor().submit(self.save, *args, **kwargs)
+
+    @classmethod
+    def afind(cls, *args, **kwargs):
+        """Like :py:meth:`find`, but return an
+        :py:class:`AsyncCursor <mongotron.Cursor.AsyncCursor>` that fetches
+        results on :py:meth:`get_executor`.
+
+            `batch_size`:
+                Number of documents fetched per executor call.
+        """
+        batch_size = kwargs.pop('batch_size', 100)
+        return AsyncCursor(cls.find(*args, **kwargs), cls.get_executor(),
+                           batch_size=batch_size)
+
+    @classmethod
+    def afind_one(cls, *args, **kwargs):
+        """Like :py:meth:`find_one`, but run on :py:meth:`get_executor`,
+        returning a future."""
+        return cls.get_executor().submit(cls.find_one, *args, **kwargs)
+
+    @classmethod
+    def aget_by_id(cls, oid):
+        """Like :py:meth:`get_by_id`, but run on :py:meth:`get_executor`,
+        returning a future."""
+        return cls.get_executor().submit(cls.get_by_id, oid)
 
     def document_as_dict(self):
         """Return a dict representation of the document suitable for encoding
         as BSON."""
+        self.flush_expanded()
+        self.__resolve_all()
         x = {}
         for key, val in self.__attributes.iteritems():
             x[self.long_to_short(key)] = val
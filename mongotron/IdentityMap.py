@@ -0,0 +1,88 @@
+"""
+IdentityMap.py
+
+A unit-of-work scope that ensures each stored document is loaded at most once
+while the scope is active.
+"""
+
+from __future__ import absolute_import
+
+import threading
+from collections import OrderedDict
+
+_local = threading.local()
+
+
+class IdentityMap(object):
+    """Map of ``(Document class, _id)`` to loaded :py:class:`Document`
+    instances. While used as a context manager, repeated calls to
+    :py:meth:`Document.get_by_id` for the same document return the same
+    instance without a database round trip, :py:meth:`Document.save` records
+    saved documents and :py:meth:`Document.delete` forgets deleted ones.
+
+    ::
+
+        with IdentityMap(max_size=1000):
+            a = User.get_by_id(oid)
+            b = User.get_by_id(oid)     # No query issued.
+            assert a is b
+
+    Scopes are per thread, and may be nested; only the innermost scope is
+    consulted.
+
+        `max_size`:
+            If not ``None``, the least recently used documents are forgotten
+            once more than this many are held.
+    """
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self._docs = OrderedDict()
+
+    def __enter__(self):
+        _local.__dict__.setdefault('stack', []).append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        _local.stack.remove(self)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def get(self, cls, oid):
+        """Return the instance of `cls` with _id `oid`, or ``None`` if it is
+        not held."""
+        doc = self._docs.pop((cls, oid), None)
+        if doc is not None:
+            self._docs[cls, oid] = doc
+        return doc
+
+    def add(self, doc):
+        """Record the saved or loaded document `doc`, evicting the least
+        recently used document if the map is full. Partially loaded
+        documents cannot stand in for a complete load, so they are not
+        recorded, but any instance held for the same document is forgotten
+        since it may now be stale."""
+        key = (doc.__class__, doc._id)
+        self._docs.pop(key, None)
+        if doc.partial:
+            return
+        self._docs[key] = doc
+        if self.max_size is not None:
+            while len(self._docs) > self.max_size:
+                self._docs.popitem(last=False)
+
+    def discard(self, doc):
+        """Forget `doc` if it is held."""
+        self._docs.pop((doc.__class__, doc._id), None)
+
+    def clear(self):
+        """Forget all documents."""
+        self._docs.clear()
+
+
+def current_identity_map():
+    """Return the innermost active :py:class:`IdentityMap` for this thread,
+    or ``None``."""
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        return stack[-1]
@@ -1,25 +1,130 @@
 
 from __future__ import absolute_import
+
+import os
+import threading
+import time
+
 from .ConnectionManager import GetConnectionManager
 
+# Guards _indexed and _blocks; replaced after fork since it may have been held
+# by another thread at the time.
+_lock = threading.Lock()
+_lock_pid = os.getpid()
+
+# Set of (pid, connection, database, collection) whose index was ensured.
+_indexed = set()
+
+# Map of (pid, connection name, database, collection, sequence) to _Block.
+_blocks = {}
+
+
+def _get_lock():
+    global _lock, _lock_pid
+    if _lock_pid != os.getpid():
+        _lock = threading.Lock()
+        _lock_pid = os.getpid()
+    return _lock
+
+
+class _Block(object):
+    """Range of reserved ids ``[next, end)`` for one sequence in this
+    process."""
+    def __init__(self, size):
+        self.lock = threading.Lock()
+        self.next = self.end = 0
+        self.size = size
+        #: time.time() of the last reservation, or ``None``.
+        self.reserved = None
+
 
 class SequenceGenerator(object):
-    
+    #: Upper bound on the number of ids reserved at once by block
+    #: allocation.
+    MAX_BLOCK_SIZE = 10000
+
+    #: Block allocation doubles the block size when a block lasts less than
+    #: this many seconds, and halves it (down to the requested size) when a
+    #: block lasts more than ten times as long.
+    BLOCK_SECONDS = 1.0
+
     @classmethod
-    def get_next_index(cls, seq_name, database_name, collection_name, connection_name=None):
+    def get_next_index(cls, seq_name, database_name, collection_name, connection_name=None, block_size=None):
+        """Return the next id from the sequence `seq_name`, stored in the
+        given collection.
+
+            `block_size`:
+                If given, reserve ids in blocks of at least this many with a
+                single update, and hand them out from a thread-safe pool in
+                this process. The block size grows with demand, up to
+                :py:attr:`MAX_BLOCK_SIZE`. Ids remain unique, but are no
+                longer ordered across processes, and reserved ids unused
+                when the process exits are skipped.
+        """
         # TODO: remove me after a few releases.
         if not isinstance(seq_name, basestring):
-            seq_name = seq_name.__class_.__name__
+            seq_name = seq_name.__class__.__name__
+
+        if not block_size or block_size <= 1:
+            collection = cls._get_collection(database_name, collection_name,
+                                             connection_name)
+            return cls._reserve(collection, seq_name, 1)
+
+        key = (os.getpid(), connection_name, database_name, collection_name,
+               seq_name)
+        with _get_lock():
+            block = _blocks.get(key)
+            if block is None:
+                block = _blocks[key] = _Block(block_size)
+
+        with block.lock:
+            if block.next >= block.end:
+                collection = cls._get_collection(database_name,
+                                                 collection_name,
+                                                 connection_name)
+                cls._refill(block, block_size, collection, seq_name)
+            new_id = block.next
+            block.next += 1
+        return new_id
 
+    @classmethod
+    def _get_collection(cls, database_name, collection_name, connection_name):
         connection = GetConnectionManager().get_connection(connection_name, True)
-        
+
         collection = connection[database_name][collection_name]
 
-        # we *DO* ensure an index here, it might be important
-        collection.ensure_index("name")
+        # we *DO* ensure an index here, it might be important, but only once
+        # per collection and process.
+        key = (os.getpid(), id(connection), database_name, collection_name)
+        if key not in _indexed:
+            collection.ensure_index("name")
+            with _get_lock():
+                _indexed.add(key)
+        return collection
+
+    @classmethod
+    def _refill(cls, block, block_size, collection, seq_name):
+        """Reserve the next range of ids for `block`, adapting its size to
+        how quickly the previous range was used."""
+        now = time.time()
+        if block.reserved is not None:
+            elapsed = now - block.reserved
+            if elapsed < cls.BLOCK_SECONDS:
+                block.size = min(block.size * 2,
+                                 max(cls.MAX_BLOCK_SIZE, block_size))
+            elif elapsed > 10 * cls.BLOCK_SECONDS:
+                block.size = max(block.size // 2, block_size)
+        last = cls._reserve(collection, seq_name, block.size)
+        block.next = last - block.size + 1
+        block.end = last + 1
+        block.reserved = now
 
+    @staticmethod
+    def _reserve(collection, seq_name, count):
+        """Atomically advance `seq_name` by `count`, returning its new
+        value."""
         new_id = collection.find_and_modify(query={"name":seq_name},
-                                            update={"$inc":{"seq":long(1)}},
+                                            update={"$inc":{"seq":long(count)}},
                                             new=True,
                                             upsert=True).get("seq")
 
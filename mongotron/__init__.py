@@ -3,5 +3,8 @@ from __future__ import absolute_import
 from .Document import Document
 from .SequenceGenerator import SequenceGenerator
 from .Cursor import Cursor
+from .IdentityMap import IdentityMap
+from .Cache import Cache, LRUCache
 from .ConnectionManager import GetConnectionManager
 from .exceptions import ValidationError
+from .exceptions import NotLoadedError
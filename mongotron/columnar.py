@@ -0,0 +1,152 @@
+"""
+Accumulation of query results into per-field columns, as returned by
+:py:meth:`Cursor.to_columns <mongotron.Cursor.Cursor.to_columns>`.
+
+Columns are NumPy arrays when NumPy is installed. Otherwise numeric and
+boolean columns are :py:class:`array.array` instances, and all other columns
+are lists.
+
+An absent int or bool value with no default cannot be represented in its
+column, so the column is converted to ``float64`` (absent values becoming
+NaN) or ``object`` (absent values becoming ``None``) respectively.
+"""
+
+from __future__ import absolute_import
+
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import field_types
+
+#: NumPy dtypes of field types with a natural columnar representation, in
+#: order of preference. Columns for other fields have the ``object`` dtype.
+NUMPY_DTYPES = (
+    (field_types.BoolField, 'bool'),
+    (field_types.IntField, 'int64'),
+    (field_types.FloatField, 'float64'),
+    (field_types.DatetimeField, 'datetime64[ms]'),
+)
+
+try:
+    array.array('q')
+    _INT64 = 'q'
+except ValueError:
+    # Python 2 lacks 'q', but 'l' is 64 bits on LP64 platforms.
+    _INT64 = 'l'
+
+#: :py:mod:`array` typecodes used for each NumPy dtype when NumPy is absent.
+#: Columns of any other dtype are lists.
+ARRAY_TYPECODES = {
+    'bool': 'B',
+    'int64': _INT64,
+    'float64': 'd',
+}
+
+#: Initial capacity of each NumPy column, doubled as necessary.
+INITIAL_CAPACITY = 1024
+
+
+def field_dtype(field):
+    """Return the NumPy dtype name describing values of the
+    :py:class:`Field <mongotron.field_types.Field>` `field`."""
+    for klass, dtype in NUMPY_DTYPES:
+        if isinstance(field, klass):
+            return dtype
+    return 'object'
+
+
+class NumpyColumn(object):
+    """Growable NumPy array of `dtype`, substituting `missing` for absent
+    values."""
+    def __init__(self, dtype, missing):
+        self.data = numpy.empty(INITIAL_CAPACITY, dtype=dtype)
+        self.size = 0
+        self.missing = missing
+        self.datetimes = self.data.dtype.kind == 'M'
+
+    def append(self, value):
+        if self.size == len(self.data):
+            self.data.resize(2 * self.size, refcheck=False)
+        if value is None:
+            if self.missing is None and self.data.dtype.kind in 'bi':
+                self.promote()
+            value = self.missing
+        elif self.datetimes and value.tzinfo is not None:
+            # BSON datetimes are UTC; NumPy rejects aware datetimes.
+            value = value.replace(tzinfo=None)
+        self.data[self.size] = value
+        self.size += 1
+
+    def promote(self):
+        """Convert an int column to ``float64`` or a bool column to
+        ``object``, so absent values can be stored."""
+        dtype = 'float64' if self.data.dtype.kind == 'i' else 'object'
+        self.data = self.data.astype(dtype)
+        self.missing = missing_value(dtype)
+
+    def finish(self):
+        self.data.resize(self.size, refcheck=False)
+        return self.data
+
+
+class ListColumn(object):
+    """Column accumulated in an :py:class:`array.array` of `typecode`, or a
+    list if `typecode` is ``None``."""
+    def __init__(self, typecode, missing):
+        self.data = array.array(typecode) if typecode else []
+        self.missing = missing
+        self.append = self.data.append
+        if missing is not None or typecode:
+            self.append = self.append_missing
+
+    def append_missing(self, value):
+        if value is None:
+            if self.missing is None and isinstance(self.data, array.array):
+                self.promote()
+            value = self.missing
+        self.data.append(value)
+
+    def promote(self):
+        """Convert an int array to a float array or a bool array to a list,
+        so absent values can be stored."""
+        if self.data.typecode == 'B':
+            self.data = map(bool, self.data)
+        else:
+            self.data = array.array('d', self.data)
+            self.missing = float('nan')
+
+    def finish(self):
+        return self.data
+
+
+def missing_value(dtype, default=None):
+    """Return the value stored in a `dtype` column when a field is absent
+    from a document: `default` if it is not ``None``, otherwise NaN or NaT
+    where the dtype allows."""
+    if default is not None:
+        return default
+    if numpy is not None:
+        kind = numpy.dtype(dtype).kind
+        if kind == 'f':
+            return numpy.nan
+        elif kind == 'M':
+            return numpy.datetime64('NaT')
+    elif ARRAY_TYPECODES.get(dtype) == 'd':
+        return float('nan')
+
+
+def make_column(field, dtype=None, default=None):
+    """Return an empty column for values of `field`, which may be ``None``
+    for keys that are not described by the document class. `dtype` overrides
+    the dtype implied by the field type, and `default` is the value of
+    absent fields (see :py:func:`missing_value`)."""
+    if dtype is None:
+        dtype = field_dtype(field)
+    missing = missing_value(dtype, default)
+    if numpy is not None:
+        return NumpyColumn(dtype, missing)
+    return ListColumn(ARRAY_TYPECODES.get(dtype), missing)
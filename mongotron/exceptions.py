@@ -16,3 +16,9 @@ class ValidationError(Error):
         #: Path to the erroneous field, from the root of the document being
         #: validated. Uses MongoDB-style "doc.bar.0.foo"
         self.path = path
+
+
+class NotLoadedError(Error):
+    """An attempt was made to read a field of a partially loaded document that
+    was excluded from the query's projection.
+    """
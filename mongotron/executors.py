@@ -0,0 +1,121 @@
+"""
+Executors used by the asynchronous Document API (:py:meth:`Document.asave`,
+:py:meth:`Document.afind_one` and friends).
+
+The asynchronous API runs the ordinary blocking implementation on an
+executor, so hooks, validation and field mapping behave identically, and
+documents share connections registered with the ConnectionManager. Every
+executor provides:
+
+    ``submit(fn, *args, **kwargs)``:
+        Arrange for ``fn(*args, **kwargs)`` to run, returning a future for
+        its result.
+
+Thread-based executors require ``concurrent.futures``, which is part of the
+standard library on Python 3 and available as the ``futures`` package on
+Python 2.
+"""
+
+from __future__ import absolute_import
+
+import threading
+
+try:
+    from concurrent.futures import Future, ThreadPoolExecutor
+except ImportError:
+    Future = ThreadPoolExecutor = None
+
+try:
+    import asyncio
+except ImportError:
+    try:
+        import trollius as asyncio
+    except ImportError:
+        asyncio = None
+
+#: Number of worker threads used by the default executor.
+DEFAULT_WORKERS = 8
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def _require_futures():
+    if Future is None:
+        raise ImportError('the asynchronous API requires concurrent.futures; '
+                          'install the "futures" package')
+
+
+class ThreadExecutor(object):
+    """Run blocking calls on a pool of `max_workers` threads, returning
+    :py:class:`concurrent.futures.Future` instances."""
+    def __init__(self, max_workers=DEFAULT_WORKERS):
+        _require_futures()
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def submit(self, fn, *args, **kwargs):
+        return self.pool.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait=True):
+        self.pool.shutdown(wait=wait)
+
+
+class InlineExecutor(object):
+    """Run calls immediately in the calling thread, returning already
+    completed :py:class:`concurrent.futures.Future` instances. Useful for
+    exercising asynchronous code against an in-process stand-in for MongoDB
+    without any threads."""
+    def __init__(self):
+        _require_futures()
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+class AsyncioExecutor(object):
+    """Run blocking calls on `executor` (a thread pool by default) via the
+    event loop `loop`, returning asyncio futures that coroutines may wait
+    for. Under trollius::
+
+        set_executor(AsyncioExecutor(loop))
+
+        @trollius.coroutine
+        def rename(oid):
+            doc = yield From(User.aget_by_id(oid))
+            doc.name = u'Bob'
+            yield From(doc.asave())
+    """
+    def __init__(self, loop=None, executor=None):
+        if asyncio is None:
+            raise ImportError('AsyncioExecutor requires asyncio or trollius')
+        self.loop = loop or asyncio.get_event_loop()
+        self.executor = executor
+
+    def submit(self, fn, *args, **kwargs):
+        if kwargs:
+            return self.loop.run_in_executor(self.executor,
+                                             lambda: fn(*args, **kwargs))
+        return self.loop.run_in_executor(self.executor, fn, *args)
+
+
+def get_executor():
+    """Return the executor used by Document classes that do not set
+    :py:attr:`Document.__executor__`, creating a :py:class:`ThreadExecutor`
+    on first use."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = ThreadExecutor()
+        return _default
+
+
+def set_executor(executor):
+    """Replace the default executor returned by :py:func:`get_executor`."""
+    global _default
+    with _default_lock:
+        _default = executor
@@ -0,0 +1,164 @@
+"""
+Streaming export of stored documents to newline-delimited JSON or CSV.
+
+Results are read from MongoDB in batches and each one is written as soon as
+it is received, so memory use is bounded regardless of the size of the result
+set. Values are expanded through each field's
+:py:class:`Field <mongotron.field_types.Field>` type, but no
+:py:class:`Document <mongotron.Document>` instances are created for the
+exported rows.
+
+::
+
+    with open('users.ndjson', 'w') as fp:
+        export_ndjson(User, fp, {'active': True}, fields=['name', 'created'])
+"""
+
+from __future__ import absolute_import
+
+import base64
+import csv
+import datetime
+import json
+import math
+import uuid
+
+import bson
+import bson.objectid
+
+from . import field_types
+
+
+def json_value(value, field=None):
+    """Return the expanded field value `value` converted to types that can be
+    encoded as JSON. Dates become ISO 8601 strings, ObjectIds and UUIDs become
+    strings, NaN and infinite floats become ``None``, sets become lists and
+    Documents become dicts with canonical field names.
+
+    Values of a :py:class:`BlobField <mongotron.field_types.BlobField>`
+    `field` and :py:class:`bson.Binary` values become base64 strings. Other
+    byte strings are decoded as UTF-8 text, or base64 encoded if they are not
+    valid UTF-8."""
+    if value is None or isinstance(value, (bool, int, long, unicode)):
+        return value
+    elif isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            return None
+        return value
+    elif isinstance(value, bytes):
+        if isinstance(value, bson.Binary) or \
+                isinstance(field, field_types.BlobField):
+            return base64.b64encode(value)
+        try:
+            return value.decode('utf-8')
+        except UnicodeDecodeError:
+            return base64.b64encode(value)
+    elif isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    elif isinstance(value, (bson.objectid.ObjectId, uuid.UUID)):
+        return str(value)
+    elif isinstance(value, dict):
+        field = getattr(field, 'value_type', None)
+        return dict((unicode(k), json_value(v, field))
+                    for k, v in value.iteritems())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        field = getattr(field, 'element_type', None)
+        return [json_value(elem, field) for elem in value]
+    elif hasattr(value, 'to_json_dict'):
+        return value.to_json_dict()
+    return unicode(value)
+
+
+def row_plan(doc_type, fields=None):
+    """Return a list of ``(name, short, field)`` tuples describing how to read
+    and expand each of the canonical field names in `fields` (or every field
+    of `doc_type`, ``_id`` first) from a document as stored."""
+    if fields is None:
+        fields = sorted(doc_type.field_types, key=lambda k: (k != '_id', k))
+    return [(name, doc_type.long_to_short(name), doc_type.field_types[name])
+            for name in fields]
+
+
+def json_row(plan, get):
+    """Return a dict of canonical names to JSON-compatible values, reading
+    collapsed values for each field in `plan` using `get`. Fields that are
+    not set are omitted."""
+    row = {}
+    for name, short, field in plan:
+        value = get(short)
+        if value is not None:
+            row[name] = json_value(field.expand(value), field)
+    return row
+
+
+def iter_raw(doc_type, spec=None, fields=None, batch_size=1000):
+    """Yield the documents of `doc_type` matching the query `spec` as stored,
+    fetching `batch_size` documents per round trip. If `fields` is given,
+    only those fields are transferred."""
+    projection = None
+    if fields is not None:
+        projection = doc_type.make_projection(only=fields)[0]
+    if spec is not None:
+        spec = doc_type.map_search_dict(spec)
+    cursor = doc_type.get_collection('scan').find(spec, fields=projection)
+    return cursor.batch_size(batch_size)
+
+
+def export_ndjson(doc_type, fp, spec=None, fields=None, batch_size=1000):
+    """Write the documents of `doc_type` matching the query `spec` to the file
+    object `fp` as one JSON object per line, returning the number written.
+
+        `fields`:
+            Sequence of canonical field names to export; by default all
+            fields are exported.
+
+        `batch_size`:
+            Number of documents fetched per round trip.
+    """
+    plan = row_plan(doc_type, fields)
+    count = 0
+    for dct in iter_raw(doc_type, spec, fields, batch_size):
+        fp.write(json.dumps(json_row(plan, dct.get), separators=(',', ':')))
+        fp.write('\n')
+        count += 1
+    return count
+
+
+def export_csv(doc_type, fp, spec=None, fields=None, batch_size=1000,
+               header=True):
+    """Write the documents of `doc_type` matching the query `spec` to the file
+    object `fp` as CSV with one column per field, returning the number of
+    rows written. Lists and dicts are written as JSON, absent values as empty
+    cells, and text as UTF-8.
+
+        `fields`:
+            Sequence of canonical field names giving the columns; by default
+            all fields are exported.
+
+        `batch_size`:
+            Number of documents fetched per round trip.
+
+        `header`:
+            If ``True``, first write a row of field names.
+    """
+    plan = row_plan(doc_type, fields)
+    writer = csv.writer(fp)
+    if header:
+        writer.writerow([name for name, short, field in plan])
+    count = 0
+    for dct in iter_raw(doc_type, spec, fields, batch_size):
+        row = json_row(plan, dct.get)
+        writer.writerow([_csv_value(row.get(name))
+                         for name, short, field in plan])
+        count += 1
+    return count
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    elif isinstance(value, (list, dict)):
+        return json.dumps(value, separators=(',', ':'))
+    elif isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
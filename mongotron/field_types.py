@@ -6,6 +6,7 @@ from __future__ import absolute_import
 
 import copy
 import datetime
+import re
 import uuid
 import bson
 import bson.objectid
@@ -30,6 +31,40 @@ def is_basic(*fields):
     return True
 
 
+#: Types whose instances cannot be mutated in place, so a default value of
+#: one of these types may be shared rather than copied.
+IMMUTABLE_TYPES = (type(None), bool, int, long, float, complex, str, unicode,
+                   datetime.datetime, datetime.date, datetime.time,
+                   datetime.timedelta, uuid.UUID, bson.objectid.ObjectId)
+
+
+def is_immutable(value):
+    """Return ``True`` if `value` can never be modified in place, and so may
+    be shared between documents instead of copied."""
+    if isinstance(value, IMMUTABLE_TYPES):
+        return True
+    if type(value) in (tuple, frozenset):
+        return all(is_immutable(elem) for elem in value)
+    return False
+
+
+def make_factory(value):
+    """Return a function of no arguments producing a fresh copy of `value`.
+    Immutable values are shared, and flat lists, dicts and sets of immutable
+    values are copied using their constructor, avoiding the cost of
+    :py:func:`copy.deepcopy` for all but nested mutable values."""
+    if is_immutable(value):
+        return lambda: value
+    kind = type(value)
+    if kind in (list, set, dict):
+        elems = value.itervalues() if kind is dict else value
+        if all(is_immutable(elem) for elem in elems):
+            if not value:
+                return kind
+            return lambda: kind(value)
+    return lambda: copy.deepcopy(value)
+
+
 def type_name(o):
     s = getattr(o, '__name__', None)
     if not s:
@@ -69,13 +104,25 @@ class Field(object):
             self.__doc__ = doc
         self.readonly = readonly
         self.write_once = write_once
+        #: Function used to validate assigned values; replaced by the result
+        #: of :py:meth:`compile_validator` when the owning Document class is
+        #: created.
+        self.validator = self.validate
         if default is None:
             default = self._DEFAULT
+        #: ``True`` if :py:meth:`make` always returns the same immutable
+        #: value, which may then be shared between documents.
+        self.shared_default = False
         if callable(default):
             # Shadow Field.make() using the user-provided callable.
             self.make = default
         else:
             self.default = default
+            if type(self).make.im_func is Field.make.im_func:
+                # Shadow Field.make() using a constructor specialised for the
+                # default, rather than deep-copying it each time.
+                self.make = make_factory(default)
+                self.shared_default = is_immutable(default)
         # TODO: commented out until None vs. _DEFAULT mess fixed.
         #self.validate(self.make())
 
@@ -87,14 +134,23 @@ class Field(object):
         attribute from the :py:class:`Document` if it exists, expanding and
         returning it, otherwise return the default value if one is set,
         otherwise ``None``.
+
+        The result is cached on the document until the field is next
+        modified, so repeated reads return the same object.
         """
         if obj is None:
             return self
+        try:
+            return obj._expanded[self.name]
+        except KeyError:
+            pass
         value = obj.get(self.name)
         if value is None:
-            return self.make()
+            value = self.make()
         else:
-            return self.expand(value)
+            value = self.expand(value)
+        obj._expanded[self.name] = value
+        return value
 
     def __set__(self, obj, value):
         """Implement the descriptor protocol by validating and collapsing the
@@ -106,13 +162,22 @@ class Field(object):
             raise ValidationError('%r is write-once' % (self.name,))
         if value is None:
             return obj.unset(self.name)
-        self.validate(value)
+        if self.validator is not None:
+            self.validator(value)
         obj.set(self.name, self.collapse(value))
+        obj._validated.add(self.name)
 
     def validate(self, value):
         """Raise an exception if `value` is not a suitable value for this
         field. The base implementation does nothing."""
 
+    def compile_validator(self):
+        """Return a function behaving like :py:meth:`validate`, specialised
+        for this field, or ``None`` if every value is acceptable. Invoked once
+        per field when its :py:class:`Document` class is created."""
+        if type(self).validate.im_func is not Field.validate.im_func:
+            return self.validate
+
     def collapse(self, value):
         """Transform `value` into a MongoDB-compatible form that will be
         persisted in the underlying document. Called after validation. The
@@ -173,6 +238,9 @@ class ListField(Field):
         """See Field.__init__()."""
         self.element_type = parse(element_type)
         self.basic = is_basic(element_type)
+        #: Compiled validator for single elements, or ``None`` if they need
+        #: no validation. Set by :py:meth:`compile_validator`.
+        self.element_validator = None
         Field.__init__(self, **kwargs)
 
     def wrap(self, value, obj):
@@ -185,9 +253,16 @@ class ListField(Field):
         generates semantic actions based on user modifications."""
         if obj is None:
             return self
-        value = Field.__get__(self, obj, klass)
+        try:
+            return obj._expanded[self.name]
+        except KeyError:
+            pass
+        value = obj.get(self.name)
+        value = self.make() if value is None else self.expand(value)
         if value is not None:
-            return self.wrap(value or self.make(), obj)
+            value = self.wrap(value or self.make(), obj)
+            obj._expanded[self.name] = value
+        return value
 
     def validate(self, value):
         """See Field.validate()."""
@@ -197,6 +272,20 @@ class ListField(Field):
         for elem in value:
             self.element_type.validate(elem)
 
+    def compile_validator(self):
+        """See Field.compile_validator(). Elements are only visited if their
+        type requires validation."""
+        container = self.CONTAINER_TYPE
+        check_elem = self.element_validator = \
+            self.element_type.compile_validator()
+        def validate(value):
+            if not isinstance(value, container):
+                self.validate(value)
+            if check_elem is not None:
+                for elem in value:
+                    check_elem(elem)
+        return validate
+
     def collapse(self, value):
         """See Field.collapse(). Collapse each element in turn."""
         if self.basic:
@@ -290,8 +379,9 @@ class FixedListField(Field):
     __get__ = ListField.__get__.im_func
 
     def validate(self, value):
-        """See Field.validate()."""
-        if type(value) is not list:
+        """See Field.validate(). Accepts list subclasses, including the
+        :py:class:`ChangeTrackingList` returned by ``__get__``."""
+        if not isinstance(value, list):
             raise ValidationError('value must be a %r.' %\
                                  (type_name(list),))
         expect_len = len(self.element_types)
@@ -353,8 +443,15 @@ class DictField(Field):
         generates semantic actions based on user modifications."""
         if obj is None:
             return self
-        value = Field.__get__(self, obj, klass)
-        return ChangeTrackingDict(value or self.make(), obj, self)
+        try:
+            return obj._expanded[self.name]
+        except KeyError:
+            pass
+        value = obj.get(self.name)
+        value = self.make() if value is None else self.expand(value)
+        value = ChangeTrackingDict(value or self.make(), obj, self)
+        obj._expanded[self.name] = value
+        return value
 
     def validate(self, dct):
         """See Field.validate()."""
@@ -364,6 +461,22 @@ class DictField(Field):
             self.key_type.validate(key)
             self.value_type.validate(value)
 
+    def compile_validator(self):
+        """See Field.compile_validator(). Keys and values are only visited if
+        their types require validation."""
+        check_key = self.key_type.compile_validator()
+        check_value = self.value_type.compile_validator()
+        def validate(dct):
+            if not isinstance(dct, dict):
+                self.validate(dct)
+            if check_key is not None:
+                for key in dct:
+                    check_key(key)
+            if check_value is not None:
+                for value in dct.itervalues():
+                    check_value(value)
+        return validate
+
     def collapse(self, dct):
         """See Field.collapse(). Collapse each element in turn."""
         if self.basic:
@@ -376,7 +489,7 @@ class DictField(Field):
         if self.basic:
             return value
         return dict((self.key_type.expand(k), self.value_type.expand(v))
-                    for k, v in dct.iteritems())
+                    for k, v in value.iteritems())
 
     @classmethod
     def parse(cls, obj, **kwargs):
@@ -410,24 +523,98 @@ class SafeDictField(DictField):
             }
     """
     @classmethod
-    def _visit(cls, obj, fn):
-        if isinstance(obj, list):
-            return [cls._visit(e, fn) for e in obj]
-        elif isinstance(obj, dict):
-            
-            x={}
-            for k, v in obj.iteritems():
-                x[fn(k)] = cls._visit(v, fn)
-            #return {fn(k): cls._visit(v, fn) for k, v in obj.iteritems()}
-            return x
-        return obj
+    def _visit(cls, obj, fn, reserved):
+        """Return `obj` with every string dict key matching the regular
+        expression `reserved` replaced by ``fn(key)``. Lists and dicts that
+        contain no such key, directly or below, are returned as-is rather
+        than copied, so only the paths leading to reserved keys are rebuilt.
+        Nesting is walked using an explicit stack, so arbitrarily deep values
+        cannot exhaust the recursion limit."""
+        if not cls._contains(obj, reserved.search):
+            return obj
+        # Each frame is [container, its slot in the parent, iterator over its
+        # (slot, child) pairs, {slot: replaced child}].
+        stack = [[obj, None, cls._items(obj), {}]]
+        while True:
+            frame = stack[-1]
+            for slot, child in frame[2]:
+                if child and isinstance(child, (list, dict)):
+                    stack.append([child, slot, cls._items(child), {}])
+                    break
+            else:
+                node, slot, _, replaced = stack.pop()
+                new = cls._rebuild(node, replaced, fn, reserved)
+                if not stack:
+                    return new
+                if new is not node:
+                    stack[-1][3][slot] = new
+
+    @staticmethod
+    def _contains(obj, search):
+        """Return ``True`` if any string dict key within `obj` matches
+        `search`."""
+        pending = [obj]
+        while pending:
+            node = pending.pop()
+            if isinstance(node, dict):
+                try:
+                    # Test all keys with one search in the common case.
+                    if search(u'\x00'.join(node)):
+                        return True
+                except (TypeError, UnicodeDecodeError):
+                    for k in node:
+                        if isinstance(k, basestring) and search(k):
+                            return True
+                node = node.itervalues()
+            elif not isinstance(node, list):
+                continue
+            for child in node:
+                if child and isinstance(child, (list, dict)):
+                    pending.append(child)
+        return False
+
+    @staticmethod
+    def _items(obj):
+        if isinstance(obj, dict):
+            return obj.iteritems()
+        return enumerate(obj)
+
+    @staticmethod
+    def _rebuild(node, replaced, fn, reserved):
+        if isinstance(node, list):
+            if not replaced:
+                return node
+            node = list(node)
+            for idx, child in replaced.iteritems():
+                node[idx] = child
+            return node
+
+        search = reserved.search
+        for k in node:
+            if isinstance(k, basestring) and search(k):
+                break
+        else:
+            if not replaced:
+                return node
+        x = {}
+        for k, v in node.iteritems():
+            if k in replaced:
+                v = replaced[k]
+            if isinstance(k, basestring) and search(k):
+                k = fn(k)
+            x[k] = v
+        return x
 
     SUB_MAP = {ord('.'): 0xff04, ord('$'): 0xff0e}
     #RSUB_MAP = {v: k for k, v in SUB_MAP.iteritems()}
     RSUB_MAP = {}
     for k, v in SUB_MAP.iteritems():
         RSUB_MAP[v] = k
-    
+
+    #: Keys that must be escaped before saving, and unescaped after loading.
+    WRAP_RE = re.compile(u'[.$]')
+    UNWRAP_RE = re.compile(u'[\uff04\uff0e]')
+
     @classmethod
     def _wrap(cls, k):
         if isinstance(k, basestring):
@@ -442,10 +629,10 @@ class SafeDictField(DictField):
 
     def collapse(self, v):
         v = super(SafeDictField, self).collapse(v)
-        return self._visit(v, self._wrap)
+        return self._visit(v, self._wrap, self.WRAP_RE)
 
     def expand(self, v):
-        v = self._visit(v, self._unwrap)
+        v = self._visit(v, self._unwrap, self.UNWRAP_RE)
         return super(SafeDictField, self).expand(v)
 
     @classmethod
@@ -615,7 +802,7 @@ class DocumentField(Field):
 
     def validate(self, value):
         """See Field.validate(). Adds type checking and sub-document
-        validation."""
+        validation, which only checks the sub-document's changed fields."""
         if not isinstance(value, self.doc_type):
             raise ValidationError('value must be a %r.' %\
                                   (type_name(self.doc_type),))
@@ -626,11 +813,20 @@ class DocumentField(Field):
         return value.document_as_dict()
 
     def expand(self, value):
-        """Produce a Document instance from the dict `value`."""
+        """Produce a Document instance from the dict `value`. Its operations
+        are cleared so that only later modifications mark it changed."""
         if not isinstance(value, dict):
             raise ValidationError('%r must be a dict, got %r' %\
                                   (self.name, value))
-        return self.doc_type(doc=value)
+        doc = self.doc_type(doc=value)
+        doc.clear_ops()
+        return doc
+
+    def make(self):
+        """See Field.make()."""
+        doc = copy.deepcopy(self.default)
+        doc.clear_ops()
+        return doc
 
     @classmethod
     def parse(cls, obj, **kwargs):
@@ -0,0 +1,156 @@
+"""
+Translation of queries using canonical field names into queries using short
+field names.
+
+Translating a query involves splitting dotted paths, looking up short names
+and walking sub-document types. Since applications issue the same few query
+shapes over and over with different values, the translation of each distinct
+set of keys is compiled once into a plan, so later queries only need to
+substitute their values.
+"""
+
+from __future__ import absolute_import
+
+from collections import OrderedDict
+from itertools import izip
+
+from bson.son import SON
+
+from . import field_types
+
+#: Operators whose operand is a list of queries.
+LOGICAL_OPS = frozenset(['$and', '$or', '$nor'])
+
+#: Dict types that are walked while translating a query. Values of any other
+#: type are copied through untouched.
+QUERY_TYPES = frozenset([dict, SON, OrderedDict])
+
+# Plan entry kinds.
+_FIELD = 'field'
+_LOGICAL = 'logical'
+_ELEM_MATCH = 'elemMatch'
+_NOT = 'not'
+_SUBDOC = 'subdoc'
+_LEAF = 'leaf'
+
+
+class PlanCache(dict):
+    """Dict of compiled plans that forgets everything once it holds
+    `max_size` entries, bounding the memory used by applications that
+    construct many differently-keyed queries."""
+    def __init__(self, max_size):
+        dict.__init__(self)
+        self.max_size = max_size
+
+    def store(self, key, plan):
+        if len(self) >= self.max_size:
+            self.clear()
+        self[key] = plan
+        return plan
+
+
+def sub_document(field):
+    """Return the :py:class:`Document` subclass stored in `field` (either
+    directly or as list elements), or ``None``."""
+    if isinstance(field, field_types.ListField):
+        field = field.element_type
+    if isinstance(field, field_types.DocumentField):
+        return field.doc_type
+
+
+def map_path(doc_type, path):
+    """Map the canonical dotted `path` to its short form, mapping each segment
+    through the field map of the sub-document it refers to. Return a tuple of
+    ``(short_path, doc_type)`` where `doc_type` is the Document subclass
+    stored at the end of the path, or ``None``."""
+    if doc_type is None:
+        return path, None
+    if path in doc_type.field_map:
+        return doc_type.field_map[path], \
+            sub_document(doc_type.field_types.get(path))
+
+    out = []
+    for seg in path.split('.'):
+        if doc_type is None or seg.isdigit() or seg.startswith('$'):
+            # Array index, positional operator or unknown sub-field.
+            out.append(seg)
+        else:
+            out.append(doc_type.long_to_short(seg))
+            doc_type = sub_document(doc_type.field_types.get(seg))
+    return '.'.join(out), doc_type
+
+
+def translate_query(doc_type, spec, plans):
+    """Return a copy of the query `spec` against `doc_type` using short field
+    names, compiling and storing plans in the :py:class:`PlanCache`
+    `plans` as necessary."""
+    key = (doc_type, tuple(spec))
+    plan = plans.get(key)
+    if plan is None:
+        plan = plans.store(key, _compile_query(doc_type, spec))
+
+    out = {}
+    for (short, sub_type, kind), value in izip(plan, spec.itervalues()):
+        if kind is _FIELD:
+            if type(value) in QUERY_TYPES:
+                value = translate_value(sub_type, value, plans)
+        elif kind is _LOGICAL and type(value) is list:
+            value = [translate_query(doc_type, elem, plans)
+                     if type(elem) in QUERY_TYPES else elem
+                     for elem in value]
+        out[short] = value
+    return out
+
+
+def _compile_query(doc_type, spec):
+    plan = []
+    for key in spec:
+        if key.startswith('$'):
+            kind = _LOGICAL if key in LOGICAL_OPS else None
+            plan.append((key, doc_type, kind))
+        else:
+            short, sub_type = map_path(doc_type, key)
+            plan.append((short, sub_type, _FIELD))
+    return tuple(plan)
+
+
+def translate_value(doc_type, value, plans):
+    """Return a copy of the dict `value`, which is either an operator
+    expression like ``{'$gt': 1}`` or a sub-document of type `doc_type`,
+    using short field names."""
+    key = (doc_type, _SUBDOC, tuple(value))
+    plan = plans.get(key)
+    if plan is None:
+        plan = plans.store(key, _compile_value(doc_type, value))
+
+    if plan is _SUBDOC:
+        return translate_query(doc_type, value, plans)
+    elif plan is _LEAF:
+        # Plain dict value with no schema to map it through.
+        return value
+
+    out = {}
+    for (op, kind), arg in izip(plan, value.itervalues()):
+        if type(arg) in QUERY_TYPES:
+            if kind is _ELEM_MATCH:
+                arg = translate_query(doc_type, arg, plans)
+            elif kind is _NOT:
+                arg = translate_value(doc_type, arg, plans)
+        out[op] = arg
+    return out
+
+
+def _compile_value(doc_type, value):
+    if any(key.startswith('$') for key in value):
+        plan = []
+        for op in value:
+            kind = None
+            if op == '$elemMatch':
+                kind = _ELEM_MATCH
+            elif op == '$not':
+                kind = _NOT
+            plan.append((op, kind))
+        return tuple(plan)
+    elif doc_type is not None:
+        return _SUBDOC
+    return _LEAF
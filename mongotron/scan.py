@@ -0,0 +1,137 @@
+"""
+Parallel scans of a collection, partitioned by ``_id`` range and run in a
+pool of worker processes. See :py:meth:`Document.parallel_scan
+<mongotron.Document.parallel_scan>`.
+"""
+
+from __future__ import absolute_import
+
+import multiprocessing
+
+import bson.objectid
+
+from .ConnectionManager import GetConnectionManager
+
+
+def id_ranges(doc_type, spec, partitions):
+    """Return a list of up to `partitions` ``(lower, upper)`` tuples that
+    together cover the ``_id`` values of documents of `doc_type` matching the
+    query `spec`. `lower` is inclusive and `upper` exclusive; ``None`` means
+    unbounded.
+
+    If the lowest and highest ``_id`` are both ObjectIds the range of their
+    creation times is split evenly, otherwise boundaries are sampled at evenly
+    spaced offsets into the results sorted by ``_id``.
+    """
+    col = doc_type.get_collection('scan')
+    spec = doc_type.map_search_dict(spec or {})
+
+    def nth_id(direction, skip=0):
+        cursor = col.find(spec, fields={'_id': 1}).sort('_id', direction)
+        for dct in cursor.skip(skip).limit(1):
+            return dct['_id']
+
+    lowest = nth_id(1)
+    if lowest is None:
+        return []
+    highest = nth_id(-1)
+
+    bounds = []
+    ObjectId = bson.objectid.ObjectId
+    if isinstance(lowest, ObjectId) and isinstance(highest, ObjectId):
+        start = lowest.generation_time
+        step = (highest.generation_time - start) // partitions
+        if step:
+            bounds = [ObjectId.from_datetime(start + step * i)
+                      for i in xrange(1, partitions)]
+    else:
+        count = col.find(spec).count()
+        bounds = [nth_id(1, count * i // partitions)
+                  for i in xrange(1, partitions)]
+
+    ranges = []
+    lower = None
+    for bound in bounds:
+        if bound is not None and bound != lower and bound > lowest:
+            ranges.append((lower, bound))
+            lower = bound
+    ranges.append((lower, None))
+    return ranges
+
+
+def range_spec(spec, lower, upper):
+    """Return `spec` restricted to ``_id`` values in ``[lower, upper)``."""
+    cond = {}
+    if lower is not None:
+        cond['$gte'] = lower
+    if upper is not None:
+        cond['$lt'] = upper
+    if not cond:
+        return spec or {}
+    if not spec:
+        return {'_id': cond}
+    return {'$and': [spec, {'_id': cond}]}
+
+
+def _connect_worker(name, connect):
+    GetConnectionManager().add_connection(connect(), name)
+
+
+def _scan_range(args):
+    doc_type, spec, fn, reduce, initial = args
+    results = (fn(doc) for doc in doc_type.find(spec, route='scan'))
+    if reduce is None:
+        return list(results)
+    acc = initial
+    for value in results:
+        acc = reduce(acc, value)
+    return acc
+
+
+def parallel_scan(doc_type, spec, fn, workers=None, partitions=None,
+                  reduce=None, initial=None, connect=None):
+    """Apply `fn` to each document of `doc_type` matching the query `spec`,
+    running :py:func:`id_ranges` partitions in a pool of `workers` processes.
+    `fn`, `reduce` and `connect` must be picklable, for example module-level
+    functions.
+
+    If `reduce` is given, each partition's results are folded using
+    ``reduce(acc, value)`` starting from `initial`, and the partition results
+    are then folded together the same way as they arrive, so `initial` must
+    be an identity for `reduce`. The final value is returned. Otherwise a list
+    of every result is returned, in no particular order.
+
+        `workers`:
+            Number of processes; defaults to the number of CPUs.
+
+        `partitions`:
+            Number of ``_id`` ranges; defaults to four per worker, so uneven
+            ranges still keep every worker busy.
+
+        `connect`:
+            Function returning a new client, registered in each worker under
+            the class's scan connection name. By default workers
+            use the connection registered in this process; connections
+            registered with a factory are recreated in each worker.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    partitions = partitions or 4 * workers
+    tasks = [(doc_type, range_spec(spec, lower, upper), fn, reduce, initial)
+             for lower, upper in id_ranges(doc_type, spec, partitions)]
+
+    initializer = initargs = None
+    if connect is not None:
+        initializer = _connect_worker
+        initargs = (doc_type.connection_name('scan') or 'default', connect)
+    pool = multiprocessing.Pool(workers, initializer, initargs or ())
+    try:
+        results = pool.imap_unordered(_scan_range, tasks)
+        if reduce is None:
+            return [value for result in results for value in result]
+        acc = initial
+        for result in results:
+            acc = reduce(acc, result)
+        return acc
+    finally:
+        pool.terminate()
+        pool.join()
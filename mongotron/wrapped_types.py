@@ -12,14 +12,25 @@ def make_wrapper(func):
     return wrapper
 
 
-def wrap_type(name, base, mutators):
+def wrap_type(name, base, mutators, deltas=None):
     """Given some built-in collection type, wrap all its mutator methods in a
     subclass such that its owner document is notified when the collection
     has changed.
+
+    `deltas` maps method names to replacement implementations that report
+    their change as a semantic operation using ``_delta()``, rather than
+    having the whole container rewritten.
     """
     def _set(self):
         """Arrange for the parent to notice the container has changed."""
         self._parent.set(self._field.name, self._field.collapse(self))
+        # Remain the cached value for the field.
+        self._parent._expanded[self._field.name] = self
+
+    def _delta(self, op, values):
+        """Arrange for the parent to apply `op` to `values` for the
+        container's field."""
+        self._parent.record_delta(self._field.name, op, values, self)
 
     def __getstate__(self):
         """Prevent pickling without explicit conversion."""
@@ -34,25 +45,82 @@ def wrap_type(name, base, mutators):
     dct = {
         '__init__': __init__,
         '_set': _set,
+        '_delta': _delta,
         '__getstate__': __getstate__
     }
     dct.update((name, make_wrapper(getattr(base, name)))
                for name in mutators)
+    dct.update(deltas or {})
     type_ = type(name, (base,), dct)
     return type_
 
 
+def _list_append(self, value):
+    list.append(self, value)
+    self._delta('$push', [value])
+
+
+def _list_extend(self, values):
+    values = list(values)
+    list.extend(self, values)
+    self._delta('$push', values)
+
+
+def _list_remove(self, value):
+    list.remove(self, value)
+    if value in self:
+        # $pull would remove every occurrence.
+        self._set()
+    else:
+        self._delta('$pullAll', [value])
+
+
+def _set_add(self, value):
+    if value not in self:
+        set.add(self, value)
+        self._delta('$addToSet', [value])
+
+
+def _set_update(self, *others):
+    values = set()
+    for other in others:
+        values.update(other)
+    values.difference_update(self)
+    if values:
+        set.update(self, values)
+        self._delta('$addToSet', list(values))
+
+
+def _set_remove(self, value):
+    set.remove(self, value)
+    self._delta('$pullAll', [value])
+
+
+def _set_discard(self, value):
+    if value in self:
+        set.discard(self, value)
+        self._delta('$pullAll', [value])
+
+
 ChangeTrackingDict = wrap_type('ChangeTrackingDict', dict, mutators=[
     '__setitem__', '__delitem__', 'clear', 'pop', 'popitem', 'update'
 ])
 
 ChangeTrackingList = wrap_type('ChangeTrackingList', list, mutators=[
-    '__setitem__', '__delitem__', 'append', 'extend', 'insert', 'pop',
-    'remove', 'reverse', 'sort'
-])
+    '__setitem__', '__delitem__', 'insert', 'pop', 'reverse', 'sort'
+], deltas={
+    'append': _list_append,
+    'extend': _list_extend,
+    'remove': _list_remove
+})
 
 ChangeTrackingSet = wrap_type('ChangeTrackingSet', set, mutators=[
-    'clear', 'pop', '__iand__', '__ior__', '__isub__', '__ixor__', 'add',
-    'difference_update', 'discard', 'intersection_update', 'remove',
-    'symmetric_difference_update', 'update'
-])
+    'clear', 'pop', '__iand__', '__ior__', '__isub__', '__ixor__',
+    'difference_update', 'intersection_update',
+    'symmetric_difference_update'
+], deltas={
+    'add': _set_add,
+    'update': _set_update,
+    'remove': _set_remove,
+    'discard': _set_discard
+})
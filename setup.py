@@ -26,6 +26,10 @@ setup(
 	packages=['mongotron'],
 	zip_safe=False,
 	install_requires=[
-		'pymongo>=2.4.1',
-	]
+		'pymongo>=2.7',
+	],
+	extras_require={
+		'async': ['futures'],
+		'columns': ['numpy'],
+	}
 )